@@ -0,0 +1,37 @@
+from fastapi import Request
+from app.services.create_card_service import CreateCardService
+from app.services.gemini_service import GeminiService
+from app.services.job_service import JobService, JobStore
+from app.config.settings import get_settings
+
+# Shared services created once per app in app.main.lifespan.
+# They are created on first use when the app runs without its lifespan (e.g. in scripts).
+
+def get_gemini_service(request: Request) -> GeminiService:
+    state = request.app.state
+    if getattr(state, "gemini_service", None) is None:
+        state.gemini_service = GeminiService()
+    return state.gemini_service
+
+def get_create_card_service(request: Request) -> CreateCardService:
+    state = request.app.state
+    if getattr(state, "create_card_service", None) is None:
+        state.create_card_service = CreateCardService(gemini_service=get_gemini_service(request))
+    return state.create_card_service
+
+def get_job_service(request: Request) -> JobService:
+    state = request.app.state
+    if getattr(state, "job_service", None) is None:
+        state.job_service = create_job_service(get_create_card_service(request))
+    return state.job_service
+
+def create_job_service(create_card_service: CreateCardService) -> JobService:
+    settings = get_settings()
+    return JobService(
+        create_card_service,
+        JobStore(settings.JOB_STORE_PATH),
+        workers=settings.JOB_WORKERS,
+        max_queue=settings.JOB_QUEUE_SIZE,
+        retry_after=settings.JOB_RETRY_AFTER,
+        ttl=settings.JOB_TTL
+    )
@@ -1,21 +1,24 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict
 from app.services.gemini_service import GeminiService
+from app.api.dependencies import get_gemini_service
 from app.models.requests import SentenceRequest, ContinueChatRequest
 from app.models.responses import SentenceResponse, ResponseStatus
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/check-sentence", response_model=SentenceResponse)
-async def check_sentence(request: SentenceRequest):
+async def check_sentence(request: SentenceRequest, gemini_service: GeminiService = Depends(get_gemini_service)):
 
     # Analyzes user's sentence and provides feedback
     
     try:
         logger.info(f"Starting sentence analysis - Word: {request.word}")
         
-        gemini_service = GeminiService()
         response = await gemini_service.sentence_response(
             word=request.word,
             sentence=request.sentence,
@@ -38,14 +41,13 @@ async def check_sentence(request: SentenceRequest):
         )
 
 @router.post("/continue", response_model=SentenceResponse)
-async def continue_chat(request: ContinueChatRequest):
+async def continue_chat(request: ContinueChatRequest, gemini_service: GeminiService = Depends(get_gemini_service)):
 
     # Continues an existing chat session with a new user message
 
     try:
         logger.info(f"Continuing chat session - Session ID: {request.session_id}")
         
-        gemini_service = GeminiService()
         response = await gemini_service.continue_chat(
             session_id=request.session_id,
             user_message=request.message
@@ -63,4 +65,47 @@ async def continue_chat(request: ContinueChatRequest):
         raise HTTPException(
             status_code=500,
             detail=f"Error continuing chat: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+# Format chat events as Server-Sent Events
+async def _sse_events(events: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    async for event in events:
+        name = event.pop("event")
+        yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@router.post("/check-sentence/stream")
+async def check_sentence_stream(request: SentenceRequest, gemini_service: GeminiService = Depends(get_gemini_service)):
+
+    # Streams the sentence analysis as it is generated: a "session" event with the
+    # session_id, "chunk" events with partial text and a final "done" (or "error") event
+
+    logger.info(f"Starting streamed sentence analysis - Word: {request.word}")
+    events = gemini_service.sentence_response_stream(
+        word=request.word,
+        sentence=request.sentence,
+        n_language=request.n_language,
+        l_language=request.l_language
+    )
+    return StreamingResponse(_sse_events(events), media_type="text/event-stream")
+
+@router.post("/continue/stream")
+async def continue_chat_stream(request: ContinueChatRequest, gemini_service: GeminiService = Depends(get_gemini_service)):
+
+    # Streams the reply to a new user message in an existing chat session
+
+    logger.info(f"Continuing streamed chat session - Session ID: {request.session_id}")
+    events = gemini_service.continue_chat_stream(
+        session_id=request.session_id,
+        user_message=request.message
+    )
+    return StreamingResponse(_sse_events(events), media_type="text/event-stream")
+
+@router.get("/sessions/{session_id}")
+async def session_info(session_id: str, gemini_service: GeminiService = Depends(get_gemini_service)):
+
+    # Returns the size of a chat session's history in messages and tokens
+
+    info = await gemini_service.get_session_info(session_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return info
@@ -1,27 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form, Body
-from typing import List
-from app.services.create_card_service import CreateCardService 
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File, Form, Body
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List
+from app.services.create_card_service import CreateCardService, DOCUMENT_CHUNK_SIZE, MAX_IMAGE_SIZE
+from app.api.dependencies import get_create_card_service
+from app.api.uploads import read_upload
+from app.config.settings import get_settings
+from app.services.ocr_executor import OCRQueueFullError
+from app.image_to_text.pages import is_pdf, pdf_supported, split_pages
+import json
 
 router = APIRouter()
 # Endpoint for creating cards from images
 @router.post("/image")
 async def extract_sentences(
+    response: Response,
     image: UploadFile = File(...),
     words: List[str] = Form(...),
     n_language: str = Form("Turkish"), 
     l_language: str = Form("English"),
+    create_card_service: CreateCardService = Depends(get_create_card_service),
 ):  
 
     try:
-        create_card_service = CreateCardService()
-        image_content = await image.read()
-        result = await create_card_service.process_image_and_create_cards(
-            image_content=image_content, 
+        image_content = await read_upload(image, MAX_IMAGE_SIZE)
+        extracted_data = await create_card_service.process_image_and_extract_sentences(image_content, words)
+        result = await create_card_service.create_cards_from_sentences(
             words=words,
+            sentences=extracted_data["sentences"],
             n_language=n_language,
             l_language=l_language
         )
+        # Report which OCR tier produced the text and whether it came from the OCR cache
+        response.headers["X-OCR-Tier"] = extracted_data["ocr_tier"]
+        response.headers["X-OCR-Cache"] = "hit" if extracted_data["ocr_cache_hit"] else "miss"
         return result
+    except HTTPException:
+        raise
+    except OCRQueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -36,10 +56,10 @@ async def extract_sentences(
     words: List[str] = Body(...),
     n_language: str = Body("Turkish"),  
     l_language: str = Body("English"), 
+    create_card_service: CreateCardService = Depends(get_create_card_service),
 ): 
     
     try:
-        create_card_service = CreateCardService()
         result = await create_card_service.process_text_and_create_cards(
             text=text, 
             words=words,
@@ -51,4 +71,179 @@ async def extract_sentences(
         raise HTTPException(
             status_code=500,
             detail=f"Error processing Text: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+# Endpoint for creating cards from a long text document (article, e-book chapter)
+# The UTF-8 text file is read in chunks, only the best sentences_per_word sentences of each
+# word are kept and turned into cards.
+@router.post("/document")
+async def create_cards_from_document(
+    response: Response,
+    file: UploadFile = File(...),
+    words: List[str] = Form(...),
+    n_language: str = Form("Turkish"),
+    l_language: str = Form("English"),
+    sentences_per_word: int = Form(1),
+    create_card_service: CreateCardService = Depends(get_create_card_service),
+):
+
+    async def chunks() -> AsyncIterator[bytes]:
+        while chunk := await file.read(DOCUMENT_CHUNK_SIZE):
+            yield chunk
+
+    return await _create_document_cards(
+        response, chunks(), words, n_language, l_language, sentences_per_word, create_card_service
+    )
+
+# Same as /document for a raw text body, e.g. sent with Transfer-Encoding: chunked
+# The body is processed while it arrives, words and languages are query parameters.
+@router.post("/document/raw")
+async def create_cards_from_document_body(
+    request: Request,
+    response: Response,
+    words: List[str] = Query(...),
+    n_language: str = Query("Turkish"),
+    l_language: str = Query("English"),
+    sentences_per_word: int = Query(1),
+    create_card_service: CreateCardService = Depends(get_create_card_service),
+):
+
+    return await _create_document_cards(
+        response, request.stream(), words, n_language, l_language, sentences_per_word, create_card_service
+    )
+
+async def _create_document_cards(
+    response: Response,
+    chunks: AsyncIterator[bytes],
+    words: List[str],
+    n_language: str,
+    l_language: str,
+    sentences_per_word: int,
+    create_card_service: CreateCardService
+):
+    try:
+        cards, extracted_data = await create_card_service.process_document_and_create_cards(
+            chunks=chunks,
+            words=words,
+            n_language=n_language,
+            l_language=l_language,
+            sentences_per_word=sentences_per_word
+        )
+    except ValueError as e:
+        # No words, sentences_per_word out of range or an empty document, checked before any card is generated
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing document: {str(e)}"
+        )
+    # Size of the document that was scanned
+    response.headers["X-Document-Characters"] = str(extracted_data["characters"])
+    response.headers["X-Document-Sentences"] = str(extracted_data["sentence_count"])
+    return cards
+
+# Serialize card events as newline-delimited JSON
+async def _ndjson_events(first_event: Dict, events: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    yield json.dumps(first_event, ensure_ascii=False) + "\n"
+    async for event in events:
+        yield json.dumps(event, ensure_ascii=False) + "\n"
+
+# Streaming endpoint for creating cards from images
+# Emits an "extracted" event with the OCR text and matched sentences, one "card" event per
+# card as soon as it is generated, and a final "summary" event listing failures.
+@router.post("/image/stream")
+async def stream_sentences(
+    image: UploadFile = File(...),
+    words: List[str] = Form(...),
+    n_language: str = Form("Turkish"), 
+    l_language: str = Form("English"),
+    create_card_service: CreateCardService = Depends(get_create_card_service),
+):
+
+    try:
+        image_content = await read_upload(image, MAX_IMAGE_SIZE)
+        extracted_data = await create_card_service.process_image_and_extract_sentences(image_content, words)
+    except HTTPException:
+        raise
+    except OCRQueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing image: {str(e)}"
+        )
+
+    events = create_card_service.stream_cards_from_sentences(
+        words=words,
+        sentences=extracted_data["sentences"],
+        n_language=n_language,
+        l_language=l_language
+    )
+    return StreamingResponse(
+        _ndjson_events({"event": "extracted", **extracted_data}, events),
+        media_type="application/x-ndjson"
+    )
+
+# Streaming endpoint for creating cards from text
+@router.post("/text/stream")
+async def stream_text_sentences(
+    text: str = Body(...),
+    words: List[str] = Body(...),
+    n_language: str = Body("Turkish"),  
+    l_language: str = Body("English"), 
+    create_card_service: CreateCardService = Depends(get_create_card_service),
+):
+
+    try:
+        extracted_data = create_card_service.extract_sentences_from_text(text, words)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing Text: {str(e)}"
+        )
+
+    events = create_card_service.stream_cards_from_sentences(
+        words=words,
+        sentences=extracted_data["sentences"],
+        n_language=n_language,
+        l_language=l_language
+    )
+    return StreamingResponse(
+        _ndjson_events({"event": "extracted", **extracted_data}, events),
+        media_type="application/x-ndjson"
+    )
+
+# Streaming endpoint for creating cards from a multi-page document
+# Accepts several page images and/or multi-page TIFF or PDF files. Emits a "page" event per
+# page with the words first found on it, one "card" event per word and a final "summary".
+@router.post("/batch")
+async def stream_pages(
+    files: List[UploadFile] = File(...),
+    words: List[str] = Form(...),
+    n_language: str = Form("Turkish"), 
+    l_language: str = Form("English"),
+    create_card_service: CreateCardService = Depends(get_create_card_service),
+):
+
+    max_size = get_settings().MAX_REQUEST_SIZE
+    uploads = [await read_upload(upload, max_size) for upload in files]
+    if not any(uploads):
+        raise HTTPException(status_code=400, detail="No pages uploaded")
+    if not pdf_supported() and any(is_pdf(content) for content in uploads):
+        raise HTTPException(status_code=415, detail="PDF uploads require the pypdfium2 package")
+
+    def pages():
+        for content in uploads:
+            yield from split_pages(content)
+
+    events = create_card_service.stream_cards_from_pages(
+        pages=pages(),
+        words=words,
+        n_language=n_language,
+        l_language=l_language
+    )
+    return StreamingResponse(_ndjson_events({"event": "batch", "files": len(uploads)}, events), media_type="application/x-ndjson")
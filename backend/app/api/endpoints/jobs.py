@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import JSONResponse
+from typing import List, Optional
+from app.services.job_service import JobService, JobQueueFullError
+from app.api.dependencies import get_job_service
+from app.api.uploads import read_upload
+from app.services.create_card_service import MAX_IMAGE_SIZE
+
+router = APIRouter()
+
+# Endpoint for starting a card job from an image or a text
+# Returns 202 with the job id right away, the cards are fetched with GET /jobs/{job_id}.
+@router.post("/jobs", status_code=202)
+async def create_job(
+    words: List[str] = Form(...),
+    image: Optional[UploadFile] = File(None),
+    text: Optional[str] = Form(None),
+    n_language: str = Form("Turkish"),
+    l_language: str = Form("English"),
+    job_service: JobService = Depends(get_job_service),
+):
+
+    if (image is None) == (text is None):
+        raise HTTPException(status_code=400, detail="Provide either an image or a text")
+
+    try:
+        if image is not None:
+            job_id = await job_service.submit_image(await read_upload(image, MAX_IMAGE_SIZE), words, n_language, l_language)
+        else:
+            job_id = await job_service.submit_text(text, words, n_language, l_language)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": "queued"},
+        headers={"Location": f"/api/cards/jobs/{job_id}"}
+    )
+
+# Endpoint for the status, progress and cards generated so far of a job
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, job_service: JobService = Depends(get_job_service)):
+    job = await job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
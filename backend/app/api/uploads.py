@@ -0,0 +1,98 @@
+from typing import List, Tuple
+from fastapi import HTTPException, UploadFile
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.monitoring.metrics import stage
+
+# Size of the pieces an upload is read in
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+# Read an uploaded file, failing with 413 as soon as it is larger than max_size
+# The multipart parser has already spooled the file (to disk beyond 1MB), so reading it in
+# chunks never holds more than max_size plus one chunk in memory.
+async def read_upload(upload: UploadFile, max_size: int) -> bytes:
+    if upload.size is not None and upload.size > max_size:
+        raise HTTPException(status_code=413, detail=_too_large(max_size))
+
+    with stage("upload_read"):
+        chunks, size = [], 0
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=413, detail=_too_large(max_size))
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+def _too_large(max_size: int) -> str:
+    return f"Upload exceeds maximum limit of {max_size / (1024 * 1024):.1f}MB"
+
+
+# Reject request bodies above a size limit before they are parsed
+# The limit is the one of the longest matching path prefix, or default_limit. A declared
+# Content-Length is checked up front. Otherwise the body is counted as it arrives and reading
+# stops at the limit, so an oversized upload is never spooled in full.
+class BodySizeLimitMiddleware:
+    def __init__(self, app: ASGIApp, default_limit: int, limits: List[Tuple[str, int]] = ()):
+        self.app = app
+        self.default_limit = default_limit
+        self.limits = sorted(limits, key=lambda limit: len(limit[0]), reverse=True)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit_for(scope["path"])
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                await self._reject(send, limit)
+                return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Stop reading, the app sees a disconnect and its response is replaced below
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message):
+            nonlocal response_started
+            if exceeded and not response_started:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not response_started:
+            await self._reject(send, limit)
+
+    def _limit_for(self, path: str) -> int:
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return self.default_limit
+
+    @staticmethod
+    async def _reject(send: Send, limit: int):
+        body = ('{"detail":"' + _too_large(limit) + '"}').encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
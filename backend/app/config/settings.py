@@ -1,6 +1,9 @@
 import os
 from functools import lru_cache
 
+# Directory for local state such as caches
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
 # Configuration settings for the application
 class Settings:
     def __init__(self):
@@ -14,9 +17,110 @@ class Settings:
                         if line.startswith("GEMINI_API_KEY="):
                             self.GEMINI_API_KEY = line.split("=", 1)[1].strip()
                             break
-        
-        if not self.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY not found in environment or .env file")
+        # A missing key is reported when Gemini is first used (see GeminiService.llm_backend),
+        # so health checks and OCR keep working without one
+
+        # LLM backend: "gemini" calls the Gemini API, "fake" answers in-process for offline load
+        # tests, after a latency drawn from FAKE_LLM_LATENCY ("fixed:0.5", "uniform:0.2,1.5",
+        # "lognormal:0.8,0.5" for median and sigma, "exponential:0.5" for the mean, in seconds),
+        # failing FAKE_LLM_ERROR_RATE of the calls with a 500 and FAKE_LLM_THROTTLE_RATE with a 429.
+        # FAKE_LLM_CARDS is an optional JSON file of canned cards keyed by word.
+        self.LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+        self.FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:0.8,0.4")
+        self.FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+        self.FAKE_LLM_THROTTLE_RATE = float(os.getenv("FAKE_LLM_THROTTLE_RATE", "0"))
+        self.FAKE_LLM_CARDS = os.getenv("FAKE_LLM_CARDS", "")
+        self.FAKE_LLM_SEED = os.getenv("FAKE_LLM_SEED", "")
+
+        # Maximum number of card generation requests in flight per API request
+        self.CARD_GENERATION_CONCURRENCY = int(os.getenv("CARD_GENERATION_CONCURRENCY", "5"))
+        # Maximum number of cards requested in a single Gemini call (1 disables batching)
+        self.CARD_BATCH_SIZE = int(os.getenv("CARD_BATCH_SIZE", "8"))
+
+        # Card cache: in-memory LRU entries, entry lifetime in seconds and SQLite file (empty disables disk tier)
+        self.CARD_CACHE_SIZE = int(os.getenv("CARD_CACHE_SIZE", "1024"))
+        self.CARD_CACHE_TTL = float(os.getenv("CARD_CACHE_TTL", str(7 * 24 * 3600)))
+        self.CARD_CACHE_PATH = os.getenv("CARD_CACHE_PATH", os.path.join(DATA_DIR, "card_cache.db"))
+
+        # Lexicon of context-free card fields (translation, pronunciation, part of speech, synonyms),
+        # one SQLite file per language pair in LEXICON_DIR, read through mmap of up to LEXICON_MMAP_SIZE bytes
+        self.LEXICON_ENABLED = os.getenv("LEXICON_ENABLED", "true").lower() == "true"
+        self.LEXICON_DIR = os.getenv("LEXICON_DIR", os.path.join(DATA_DIR, "lexicon"))
+        self.LEXICON_MMAP_SIZE = int(os.getenv("LEXICON_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+        # Chat sessions: "memory" keeps them per process, "sqlite" shares them between workers
+        self.SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+        self.SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join(DATA_DIR, "sessions.db"))
+        self.SESSION_TIMEOUT = float(os.getenv("SESSION_TIMEOUT", "300"))
+        self.SESSION_CAPACITY = int(os.getenv("SESSION_CAPACITY", "10000"))
+
+        # Outbound Gemini scheduler: requests per minute and burst for the whole deployment (split
+        # between WEB_CONCURRENCY uvicorn workers), upper bound of the adaptive concurrency window,
+        # attempts per call, latency (seconds) above which concurrency is reduced, and per-lane deadlines
+        self.WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+        self.GEMINI_RATE_LIMIT = float(os.getenv("GEMINI_RATE_LIMIT", "1000"))
+        self.GEMINI_BURST = int(os.getenv("GEMINI_BURST", "20"))
+        self.GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+        self.GEMINI_MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", "4"))
+        self.GEMINI_LATENCY_TARGET = float(os.getenv("GEMINI_LATENCY_TARGET", "15"))
+        self.GEMINI_INTERACTIVE_DEADLINE = float(os.getenv("GEMINI_INTERACTIVE_DEADLINE", "30"))
+        self.GEMINI_BULK_DEADLINE = float(os.getenv("GEMINI_BULK_DEADLINE", "120"))
+
+        # Chat history: "bounded" folds older turns into a summary once a session exceeds
+        # CHAT_TOKEN_BUDGET (estimated tokens), keeping the last CHAT_HISTORY_WINDOW exchanges
+        # verbatim; "full" resends the whole history on every turn
+        self.CHAT_HISTORY_MODE = os.getenv("CHAT_HISTORY_MODE", "bounded")
+        self.CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "4000"))
+        self.CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "4"))
+
+        # Startup: "background" loads the OCR workers and the Gemini client after the server
+        # accepts connections (/health/ready reports when they are loaded), "eager" loads them
+        # before serving and "lazy" loads them on first use
+        self.STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+
+        # Stage latency histograms on /metrics and Server-Timing headers on card and chat responses
+        self.METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+        # Sampling profiler: requests slower than this many milliseconds are profiled (0 disables it),
+        # with one stack sample every PROFILE_SAMPLE_INTERVAL_MS, written to PROFILE_DIR
+        self.PROFILE_SLOW_REQUESTS_MS = float(os.getenv("PROFILE_SLOW_REQUESTS_MS", "0"))
+        self.PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+        self.PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+
+        # Largest request body accepted by endpoints without a tighter limit (batch documents, jobs)
+        self.MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", str(50 * 1024 * 1024)))
+
+        # Background card jobs: SQLite file, worker tasks, queued jobs before new ones are rejected,
+        # Retry-After seconds when full and how long finished jobs are kept
+        self.JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(DATA_DIR, "jobs.db"))
+        self.JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+        self.JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+        self.JOB_RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "10"))
+        self.JOB_TTL = float(os.getenv("JOB_TTL", str(24 * 3600)))
+
+        # OCR process pool: worker count, admitted jobs (running + waiting) and Retry-After seconds when full
+        self.OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+        self.OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", str(self.OCR_WORKERS * 4)))
+        self.OCR_RETRY_AFTER = int(os.getenv("OCR_RETRY_AFTER", "5"))
+
+        # Tiered OCR: try a fast pass first and escalate below this word confidence (0-100)
+        self.OCR_TIERED = os.getenv("OCR_TIERED", "true").lower() == "true"
+        self.OCR_CONFIDENCE_THRESHOLD = float(os.getenv("OCR_CONFIDENCE_THRESHOLD", "60"))
+
+        # OCR engine: "tesserocr" keeps libtesseract loaded in each worker, "pytesseract" runs the CLI,
+        # "auto" prefers tesserocr when it is installed
+        self.OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")
+
+        # Layout-aware OCR: pages whose longest side is at least this many pixels are split into
+        # text blocks that are recognized in parallel, stopping once every word has a sentence
+        self.OCR_TILED = os.getenv("OCR_TILED", "true").lower() == "true"
+        self.OCR_TILED_MIN_DIMENSION = int(os.getenv("OCR_TILED_MIN_DIMENSION", "1500"))
+
+        # OCR result cache: entries and text bytes kept in memory, perceptual hash distance
+        # (out of 1024 bits) treated as the same page, and an optional directory for evicted entries
+        self.OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "256"))
+        self.OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+        self.OCR_CACHE_MAX_DISTANCE = int(os.getenv("OCR_CACHE_MAX_DISTANCE", "64"))
+        self.OCR_CACHE_SPILL_DIR = os.getenv("OCR_CACHE_SPILL_DIR", "")
 
 @lru_cache()
 def get_settings():
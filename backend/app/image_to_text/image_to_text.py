@@ -1,86 +1,204 @@
+import io
 import os
 from PIL import Image
-from typing import Union
-import pytesseract
+from typing import Dict, List, Optional, Tuple, Union
 import cv2
 import numpy as np
-from pytesseract import Output
-from matplotlib import pyplot as plt
+from app.image_to_text.ocr_backend import OCRBackend, get_ocr_backend
+from app.monitoring.metrics import stage
 
-# Function to perform OCR on an image and return the extracted text
-def image_to_text(image_input: Union[str, np.ndarray, Image.Image], psm=3, oem=3):
+# Images larger than this (in pixels, longest side) are downsized before OCR
+MAX_DIMENSION = 2000
+
+# Mean word confidence (0-100) below which the fast OCR pass escalates to the full pipeline
+OCR_CONFIDENCE_THRESHOLD = 60
+
+
+# IMREAD_REDUCED_GRAYSCALE_* flags by reduction factor
+_REDUCED_GRAYSCALE = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+
+# Decode an encoded image straight to grayscale, no larger than max_dimension
+# The image size is read from the header first and the largest reduction factor that keeps the
+# longest side at or above max_dimension is used, so JPEGs are scaled down during decoding (DCT
+# scaling) instead of allocating the full-resolution image. Returns None for undecodable input.
+def decode_image(image_content: bytes, max_dimension: int = MAX_DIMENSION) -> Optional[np.ndarray]:
+    reduction = 1
     try:
-        # Handle different input types
-        if isinstance(image_input, str):
-            if not os.path.exists(image_input):
-                raise FileNotFoundError(f"Image file not found: {image_input}")
-            original_img = cv2.imread(image_input) 
-            if original_img is None:
-                raise ValueError("Failed to load image from path")
-                
-        elif isinstance(image_input, np.ndarray):
-            if len(image_input.shape) == 3:
-                original_img = image_input.copy() 
-            else:
-                # Grayscale 
-                original_img = cv2.cvtColor(image_input, cv2.COLOR_GRAY2BGR)
-                
-        elif isinstance(image_input, Image.Image):
-            img_array = np.array(image_input)
-            if len(img_array.shape) == 3:
-                original_img = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-            else:
-                original_img = cv2.cvtColor(img_array, cv2.COLOR_GRAY2BGR)
+        with Image.open(io.BytesIO(image_content)) as header:
+            longest_side = max(header.size)
+        while reduction < 8 and longest_side / (reduction * 2) >= max_dimension:
+            reduction *= 2
+    except Exception:
+        pass
+
+    with stage("decode"):
+        gray_img = cv2.imdecode(np.frombuffer(image_content, np.uint8), _REDUCED_GRAYSCALE[reduction])
+        if gray_img is None:
+            return None
+        return _limit_size(gray_img, max_dimension)
+
+
+# Convert any supported input into a grayscale image no larger than MAX_DIMENSION
+# Grayscale arrays are used as they are, without a copy.
+def load_image(image_input: Union[str, np.ndarray, Image.Image]) -> np.ndarray:
+    # Handle different input types
+    if isinstance(image_input, str):
+        if not os.path.exists(image_input):
+            raise FileNotFoundError(f"Image file not found: {image_input}")
+        with open(image_input, "rb") as f:
+            gray_img = decode_image(f.read())
+        if gray_img is None:
+            raise ValueError("Failed to load image from path")
+        return gray_img
+
+    elif isinstance(image_input, np.ndarray):
+        if len(image_input.shape) == 3:
+            gray_img = cv2.cvtColor(image_input, cv2.COLOR_BGR2GRAY)
         else:
-            raise ValueError(f"Unsupported image input type: {type(image_input)}")
-        
-        # Check image dimensions
-        height, width = original_img.shape[:2]
-
-        # Check if image is too large and resize if necessary
-        max_dimension = 2000
-        if max(height, width) > max_dimension:
-            scale_factor = max_dimension / max(height, width)
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            original_img = cv2.resize(original_img, (new_width, new_height), interpolation=cv2.INTER_AREA)
-            print(f"Image resized from {width}x{height} to {new_width}x{new_height}")
-
-        # Convert to grayscale
-        gray_img = cv2.cvtColor(original_img, cv2.COLOR_BGR2GRAY)
-
-        # Denoising
+            gray_img = image_input
+
+    elif isinstance(image_input, Image.Image):
+        gray_img = np.asarray(image_input.convert("L"))
+    else:
+        raise ValueError(f"Unsupported image input type: {type(image_input)}")
+
+    return _limit_size(gray_img, MAX_DIMENSION)
+
+
+# Downsize an image whose longest side is above max_dimension
+def _limit_size(img: np.ndarray, max_dimension: int) -> np.ndarray:
+    height, width = img.shape[:2]
+    if max(height, width) <= max_dimension:
+        return img
+    scale_factor = max_dimension / max(height, width)
+    new_width = int(width * scale_factor)
+    new_height = int(height * scale_factor)
+    return cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+
+# Full preprocessing pipeline: denoise, upscale and adaptive threshold
+def _preprocess_full(gray_img: np.ndarray) -> np.ndarray:
+    max_dimension = MAX_DIMENSION
+
+    # Denoising
+    with stage("denoise"):
         denoised_img = cv2.fastNlMeansDenoising(gray_img, None, 10, 7, 21)
 
-        # DPI-based scaling
-        target_dpi = 300
-        estimated_current_dpi = 72
-        dpi_scale = target_dpi / estimated_current_dpi
-        
-        optimal_width = int(denoised_img.shape[1] * min(dpi_scale, 2.0))
-        optimal_height = int(denoised_img.shape[0] * min(dpi_scale, 2.0))
-        
-        if max(optimal_height, optimal_width) > max_dimension:
-            scale = max_dimension / max(optimal_height, optimal_width)
-            optimal_width = int(optimal_width * scale)
-            optimal_height = int(optimal_height * scale)
-        
+    # DPI-based scaling
+    target_dpi = 300
+    estimated_current_dpi = 72
+    dpi_scale = target_dpi / estimated_current_dpi
+    
+    optimal_width = int(denoised_img.shape[1] * min(dpi_scale, 2.0))
+    optimal_height = int(denoised_img.shape[0] * min(dpi_scale, 2.0))
+    
+    if max(optimal_height, optimal_width) > max_dimension:
+        scale = max_dimension / max(optimal_height, optimal_width)
+        optimal_width = int(optimal_width * scale)
+        optimal_height = int(optimal_height * scale)
+    
+    with stage("threshold"):
         resized_img = cv2.resize(denoised_img, (optimal_width, optimal_height), interpolation=cv2.INTER_CUBIC)
-        
+
         # Adaptive threshold
         binary_img = cv2.adaptiveThreshold(resized_img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
                                          cv2.THRESH_BINARY, 41, 4)
-        
+
         # Dilation
         kernel = np.ones((1, 1), np.uint8)
-        dilated_img = cv2.dilate(binary_img, kernel, iterations=1)
+        return cv2.dilate(binary_img, kernel, iterations=1)
+
+
+# Rebuild plain text and confidences from OCRBackend.image_to_data output
+# Returns the text, the mean word confidence and the confidences of each requested word.
+# A requested word that was not recognized at all gets confidence 0.
+def _summarize_ocr_data(data: Dict[str, List], words: Optional[List[str]] = None) -> Tuple[str, float, Dict[str, float]]:
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    word_confidences: Dict[str, List[float]] = {}
+
+    for index, token in enumerate(data["text"]):
+        token = token.strip()
+        confidence = float(data["conf"][index])
+        if not token or confidence < 0:
+            continue
+        key = (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+        lines.setdefault(key, []).append(token)
+        confidences.append(confidence)
+        normalized = token.strip(".,;:!?\"'()[]{}").lower()
+        word_confidences.setdefault(normalized, []).append(confidence)
+
+    text_lines = []
+    previous_paragraph = None
+    for (block_num, par_num, _), tokens in lines.items():
+        if previous_paragraph is not None and previous_paragraph != (block_num, par_num):
+            text_lines.append("")
+        text_lines.append(" ".join(tokens))
+        previous_paragraph = (block_num, par_num)
+
+    mean_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    requested = {}
+    for word in words or []:
+        matches = word_confidences.get(word.lower())
+        requested[word] = max(matches) if matches else 0.0
+
+    return "\n".join(text_lines), mean_confidence, requested
+
+
+# Function to perform OCR on an image and return the extracted text
+def image_to_text(image_input: Union[str, np.ndarray, Image.Image], psm=3, oem=3, backend: Optional[OCRBackend] = None):
+    try:
+        backend = backend or get_ocr_backend()
+        gray_img = load_image(image_input)
+
+        dilated_img = _preprocess_full(gray_img)
         
         # OCR
-        myconfig = f"--psm {psm} --oem {oem}"
-        text = pytesseract.image_to_string(dilated_img, lang='eng', config=myconfig)
+        with stage("tesseract"):
+            text = backend.image_to_string(dilated_img, psm=psm, oem=oem, lang='eng')
         
         return text
         
     except Exception as e:
         print(f"OCR Error: {str(e)}") 
         raise Exception(f"OCR processing failed: {str(e)}")
+
+
+# Function to perform tiered OCR on an image
+# A cheap grayscale/Otsu pass runs first. The expensive denoise/upscale pipeline only runs
+# when the mean word confidence, or the confidence of any requested word, is below the threshold.
+# Returns the text, the tier that produced it ("fast" or "full") and the fast pass confidence.
+def image_to_text_tiered(
+    image_input: Union[str, np.ndarray, Image.Image],
+    words: Optional[List[str]] = None,
+    psm=3,
+    oem=3,
+    confidence_threshold: float = OCR_CONFIDENCE_THRESHOLD,
+    backend: Optional[OCRBackend] = None
+) -> Dict:
+    try:
+        backend = backend or get_ocr_backend()
+        gray_img = load_image(image_input)
+
+        # Fast pass
+        with stage("threshold"):
+            _, fast_img = cv2.threshold(gray_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        with stage("tesseract"):
+            data = backend.image_to_data(fast_img, psm=psm, oem=oem, lang='eng')
+        text, mean_confidence, word_confidences = _summarize_ocr_data(data, words)
+
+        if mean_confidence >= confidence_threshold and all(
+            confidence >= confidence_threshold for confidence in word_confidences.values()
+        ):
+            return {"text": text, "tier": "fast", "confidence": mean_confidence}
+
+        # Full pass
+        dilated_img = _preprocess_full(gray_img)
+        with stage("tesseract"):
+            text = backend.image_to_string(dilated_img, psm=psm, oem=oem, lang='eng')
+        return {"text": text, "tier": "full", "confidence": mean_confidence}
+
+    except Exception as e:
+        print(f"OCR Error: {str(e)}") 
+        raise Exception(f"OCR processing failed: {str(e)}")
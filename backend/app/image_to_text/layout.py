@@ -0,0 +1,42 @@
+from typing import List, Tuple
+import cv2
+import numpy as np
+
+# Text blocks smaller than this fraction of the page area are ignored (specks, page numbers)
+MIN_BLOCK_AREA_RATIO = 0.0005
+
+# Padding around each detected block, in pixels
+BLOCK_PADDING = 8
+
+
+# Find text blocks (paragraphs, columns, captions) on a grayscale page with morphology
+# Ink is binarized with Otsu and dilated with a kernel wider than the word gaps and taller
+# than the line spacing, so each paragraph merges into one connected region.
+# Returns (x, y, w, h) boxes in reading order: top to bottom, then left to right.
+def detect_text_blocks(gray_img: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    height, width = gray_img.shape[:2]
+    _, ink = cv2.threshold(gray_img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, width // 60), max(5, height // 120)))
+    merged = cv2.dilate(ink, kernel, iterations=2)
+    contours, _ = cv2.findContours(merged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = MIN_BLOCK_AREA_RATIO * width * height
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w * h < min_area:
+            continue
+        x0, y0 = max(0, x - BLOCK_PADDING), max(0, y - BLOCK_PADDING)
+        x1, y1 = min(width, x + w + BLOCK_PADDING), min(height, y + h + BLOCK_PADDING)
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+
+    # Blocks whose tops are within one line height are treated as the same row
+    row_height = max(1, height // 60)
+    boxes.sort(key=lambda box: (box[1] // row_height, box[0]))
+    return boxes
+
+
+# Cut the detected blocks out of the page
+def crop_blocks(gray_img: np.ndarray, boxes: List[Tuple[int, int, int, int]]) -> List[np.ndarray]:
+    return [np.ascontiguousarray(gray_img[y:y + h, x:x + w]) for x, y, w, h in boxes]
@@ -0,0 +1,116 @@
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List
+import numpy as np
+import pytesseract
+from pytesseract import Output
+
+# Keys of pytesseract's image_to_data output that the OCR pipeline relies on
+OCR_DATA_KEYS = ("text", "conf", "block_num", "par_num", "line_num")
+
+
+# Interface for OCR engines used by image_to_text
+# Images are 8-bit grayscale or binary numpy arrays.
+class OCRBackend(ABC):
+    name = "base"
+
+    @abstractmethod
+    def image_to_string(self, img: np.ndarray, psm: int = 3, oem: int = 3, lang: str = "eng") -> str:
+        raise NotImplementedError
+
+    # Word level results in the layout of pytesseract.image_to_data(output_type=Output.DICT)
+    @abstractmethod
+    def image_to_data(self, img: np.ndarray, psm: int = 3, oem: int = 3, lang: str = "eng") -> Dict[str, List]:
+        raise NotImplementedError
+
+    def warm_up(self):
+        blank = np.full((32, 128), 255, np.uint8)
+        self.image_to_string(blank)
+
+
+# Runs the tesseract command line tool for every image.
+# Each call starts a new process, writes the image to a temporary file and loads the language data.
+class PytesseractBackend(OCRBackend):
+    name = "pytesseract"
+
+    def image_to_string(self, img: np.ndarray, psm: int = 3, oem: int = 3, lang: str = "eng") -> str:
+        return pytesseract.image_to_string(img, lang=lang, config=f"--psm {psm} --oem {oem}")
+
+    def image_to_data(self, img: np.ndarray, psm: int = 3, oem: int = 3, lang: str = "eng") -> Dict[str, List]:
+        data = pytesseract.image_to_data(img, lang=lang, config=f"--psm {psm} --oem {oem}", output_type=Output.DICT)
+        return {key: data[key] for key in OCR_DATA_KEYS}
+
+
+# Keeps libtesseract loaded in-process through the tesserocr binding.
+# One engine per (lang, psm, oem) is created on first use and reused for every image,
+# and pixels are handed over as a raw buffer instead of an encoded temporary file.
+class TesserocrBackend(OCRBackend):
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._apis = {}
+        self._lock = threading.Lock()
+
+    def image_to_string(self, img: np.ndarray, psm: int = 3, oem: int = 3, lang: str = "eng") -> str:
+        with self._lock:
+            api = self._prepare(img, psm, oem, lang)
+            return api.GetUTF8Text()
+
+    def image_to_data(self, img: np.ndarray, psm: int = 3, oem: int = 3, lang: str = "eng") -> Dict[str, List]:
+        RIL = self._tesserocr.RIL
+        data = {key: [] for key in OCR_DATA_KEYS}
+        block_num = par_num = line_num = 0
+
+        with self._lock:
+            api = self._prepare(img, psm, oem, lang)
+            api.Recognize()
+            iterator = api.GetIterator()
+            if iterator is None:
+                return data
+
+            for word in self._tesserocr.iterate_level(iterator, RIL.WORD):
+                if word.IsAtBeginningOf(RIL.BLOCK):
+                    block_num, par_num, line_num = block_num + 1, 0, 0
+                if word.IsAtBeginningOf(RIL.PARA):
+                    par_num, line_num = par_num + 1, 0
+                if word.IsAtBeginningOf(RIL.TEXTLINE):
+                    line_num += 1
+                data["text"].append(word.GetUTF8Text(RIL.WORD) or "")
+                data["conf"].append(word.Confidence(RIL.WORD))
+                data["block_num"].append(block_num)
+                data["par_num"].append(par_num)
+                data["line_num"].append(line_num)
+        return data
+
+    def _prepare(self, img: np.ndarray, psm: int, oem: int, lang: str):
+        key = (lang, psm, oem)
+        api = self._apis.get(key)
+        if api is None:
+            # PSM and OEM are plain integer constants in tesserocr, the values are passed as they are
+            api = self._tesserocr.PyTessBaseAPI(lang=lang, psm=psm, oem=oem)
+            self._apis[key] = api
+
+        if img.ndim == 3:
+            raise ValueError("TesserocrBackend expects a single channel image")
+        img = np.ascontiguousarray(img, dtype=np.uint8)
+        height, width = img.shape
+        api.SetImageBytes(img.tobytes(), width, height, 1, width)
+        return api
+
+
+# Return the OCR backend for this process, created once and reused
+# "auto" uses the persistent tesserocr engine when it is installed and falls back to pytesseract.
+@lru_cache()
+def get_ocr_backend(name: str = "auto") -> OCRBackend:
+    if name in ("auto", "tesserocr"):
+        try:
+            return TesserocrBackend()
+        except ImportError:
+            if name == "tesserocr":
+                raise
+    if name in ("auto", "pytesseract"):
+        return PytesseractBackend()
+    raise ValueError(f"Unknown OCR backend: {name}")
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from app.config.settings import get_settings
+
+# Side of the difference hash grid, the hash has DHASH_SIZE * DHASH_SIZE bits
+DHASH_SIZE = 32
+
+# Minimum gray level step between neighbouring cells that counts as an edge.
+# Flat paper areas then hash to stable zero bits instead of JPEG noise.
+DHASH_TOLERANCE = 4
+
+
+# Longest side of the grayscale image the hash is computed from
+DHASH_DECODE_DIMENSION = 1000
+
+
+# Perceptual difference hash of an encoded image
+# The image is decoded at reduced resolution in grayscale and blurred before downscaling,
+# which keeps re-encoded or resized copies of a text page within a few percent of the bits.
+def dhash(image_content: bytes, hash_size: int = DHASH_SIZE) -> Optional[int]:
+    # OpenCV is only loaded once the first image is hashed
+    import cv2
+    import numpy as np
+    from app.image_to_text.image_to_text import decode_image
+
+    img = decode_image(image_content, DHASH_DECODE_DIMENSION)
+    if img is None:
+        return None
+    img = cv2.GaussianBlur(img, (0, 0), 2)
+    small = cv2.resize(img, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] - small[:, :-1]) > DHASH_TOLERANCE
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+# Cache of OCR results for uploaded images
+# Lookups first use the SHA-256 of the upload bytes. On a miss, the perceptual hash is
+# compared with every known entry so re-encoded or resized copies of a page also hit.
+# Memory is bounded by entry count and text size. Entries evicted from memory are
+# optionally spilled to JSON files in spill_dir, which is bounded by max_disk_entries.
+class OCRCache:
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_distance: int = 64,
+        spill_dir: Optional[str] = None,
+        max_disk_entries: int = 4096
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_distance = max_distance
+        self.spill_dir = spill_dir
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_index: "OrderedDict[str, Optional[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._load_disk_index()
+
+    # Returns (cached result or None, content hash, perceptual hash)
+    # The perceptual hash is only computed when the exact lookup misses.
+    def lookup(self, image_content: bytes) -> Tuple[Optional[Dict], str, Optional[int]]:
+        content_hash = hashlib.sha256(image_content).hexdigest()
+        with self._lock:
+            result = self._get(content_hash)
+            if result is not None:
+                self.exact_hits += 1
+                return result, content_hash, None
+
+        perceptual_hash = dhash(image_content)
+        if perceptual_hash is not None:
+            with self._lock:
+                nearest = self._nearest(perceptual_hash)
+                if nearest is not None:
+                    result = self._get(nearest)
+                    if result is not None:
+                        self.perceptual_hits += 1
+                        return result, content_hash, perceptual_hash
+
+        with self._lock:
+            self.misses += 1
+        return None, content_hash, perceptual_hash
+
+    def put(self, content_hash: str, perceptual_hash: Optional[int], result: Dict):
+        entry = {"result": result, "dhash": perceptual_hash}
+        with self._lock:
+            self._remember(content_hash, entry)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "exact_hits": self.exact_hits,
+            "perceptual_hits": self.perceptual_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk_index),
+        }
+
+    def _get(self, content_hash: str) -> Optional[Dict]:
+        entry = self._memory.get(content_hash)
+        if entry is not None:
+            self._memory.move_to_end(content_hash)
+            return entry["result"]
+
+        if content_hash in self._disk_index:
+            try:
+                with open(self._spill_path(content_hash), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                del self._disk_index[content_hash]
+                return None
+            self._remember(content_hash, entry)
+            return entry["result"]
+
+        return None
+
+    def _nearest(self, perceptual_hash: int) -> Optional[str]:
+        best_hash, best_distance = None, self.max_distance + 1
+        candidates = [(key, entry["dhash"]) for key, entry in self._memory.items()]
+        candidates.extend(self._disk_index.items())
+        for key, candidate in candidates:
+            if candidate is None:
+                continue
+            distance = hamming_distance(perceptual_hash, candidate)
+            if distance < best_distance:
+                best_hash, best_distance = key, distance
+        return best_hash
+
+    def _remember(self, content_hash: str, entry: Dict):
+        previous = self._memory.pop(content_hash, None)
+        if previous is not None:
+            self._memory_bytes -= self._entry_size(previous)
+        self._memory[content_hash] = entry
+        self._memory_bytes += self._entry_size(entry)
+
+        while len(self._memory) > 1 and (
+            len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes
+        ):
+            evicted_hash, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= self._entry_size(evicted)
+            self._spill(evicted_hash, evicted)
+
+    def _spill(self, content_hash: str, entry: Dict):
+        if not self.spill_dir:
+            return
+        try:
+            with open(self._spill_path(content_hash), "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+        except OSError:
+            return
+        self._disk_index[content_hash] = entry["dhash"]
+        self._disk_index.move_to_end(content_hash)
+        while len(self._disk_index) > self.max_disk_entries:
+            oldest_hash, _ = self._disk_index.popitem(last=False)
+            try:
+                os.remove(self._spill_path(oldest_hash))
+            except OSError:
+                pass
+
+    def _load_disk_index(self):
+        paths = [
+            os.path.join(self.spill_dir, name)
+            for name in os.listdir(self.spill_dir) if name.endswith(".json")
+        ]
+        for path in sorted(paths, key=os.path.getmtime):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self._disk_index[os.path.basename(path)[:-len(".json")]] = entry.get("dhash")
+
+    def _spill_path(self, content_hash: str) -> str:
+        return os.path.join(self.spill_dir, f"{content_hash}.json")
+
+    @staticmethod
+    def _entry_size(entry: Dict) -> int:
+        return len(entry["result"].get("text") or "")
+
+
+@lru_cache()
+def get_ocr_cache() -> OCRCache:
+    settings = get_settings()
+    return OCRCache(
+        max_entries=settings.OCR_CACHE_SIZE,
+        max_bytes=settings.OCR_CACHE_MAX_BYTES,
+        max_distance=settings.OCR_CACHE_MAX_DISTANCE,
+        spill_dir=settings.OCR_CACHE_SPILL_DIR or None,
+    )
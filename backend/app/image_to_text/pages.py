@@ -0,0 +1,65 @@
+import importlib.util
+import io
+from typing import Iterator
+
+
+def is_pdf(content: bytes) -> bool:
+    return content[:5] == b"%PDF-"
+
+
+def is_tiff(content: bytes) -> bool:
+    return content[:4] in (b"II*\x00", b"MM\x00*")
+
+
+# Whether PDFs can be rendered, checked without importing pypdfium2
+def pdf_supported() -> bool:
+    return importlib.util.find_spec("pypdfium2") is not None
+
+
+# Split an upload into encoded single-page images for the OCR pipeline
+# PDFs are rendered with pypdfium2 (optional dependency) and multi-page TIFFs are read with
+# Pillow. Pages are produced one at a time, so only the pages being processed are in memory.
+# Any other upload is passed through as a single page, without loading Pillow or OpenCV.
+def split_pages(content: bytes) -> Iterator[bytes]:
+    if is_pdf(content):
+        yield from _render_pdf(content)
+    elif is_tiff(content):
+        yield from _split_tiff(content)
+    else:
+        yield content
+
+
+def _split_tiff(content: bytes) -> Iterator[bytes]:
+    from PIL import Image, ImageSequence
+
+    with Image.open(io.BytesIO(content)) as image:
+        for frame in ImageSequence.Iterator(image):
+            yield _encode_page(frame.convert("L"))
+
+
+# Pages are rendered in grayscale with their longest side at the OCR working size, since
+# load_image would downscale anything larger
+def _render_pdf(content: bytes) -> Iterator[bytes]:
+    try:
+        import pypdfium2
+    except ImportError:
+        raise ValueError("PDF uploads require the pypdfium2 package")
+    from app.image_to_text.image_to_text import MAX_DIMENSION
+
+    document = pypdfium2.PdfDocument(content)
+    try:
+        for page_index in range(len(document)):
+            page = document[page_index]
+            width, height = page.get_size()
+            bitmap = page.render(scale=MAX_DIMENSION / max(width, height), grayscale=True)
+            yield _encode_page(bitmap.to_pil())
+            page.close()
+    finally:
+        document.close()
+
+
+# image is a PIL image
+def _encode_page(image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
@@ -1,3 +1,4 @@
+import heapq
 import re
 import os
 
@@ -24,3 +25,225 @@ def get_sentence_with_word_regex(text, word):
     
     return sentences if sentences else None
 
+
+def select_blocks_with_words(blocks, words):
+    """Return only the text blocks that contain at least one of the given words."""
+    patterns = [re.compile(f'\\b{re.escape(word)}\\b', re.IGNORECASE) for word in words]
+    return [block for block in blocks if block and any(pattern.search(block) for pattern in patterns)]
+
+
+# A sentence is a run of non-terminator characters closed by one terminator
+_SENTENCE_PATTERN = re.compile(r'[^.!?~]*[.!?~]')
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+
+class SentenceIndex:
+    """Sentence segmentation of a text plus a token -> sentence ids inverted index.
+
+    The index is built once per text, after which each word lookup only touches the
+    sentences that contain it. find() returns exactly what get_sentence_with_word_regex
+    returns for the same text and word: case-insensitive, whole words only, and a word
+    that opens the text or directly follows a terminator without a space counts only if
+    it appears again later in the sentence.
+
+    Only ASCII tokens are indexed by str.lower(), which folds ASCII the same way as
+    re.IGNORECASE. Outside ASCII the two differ ("İstanbul" matches "istanbul" with the
+    regex, "ſ" matches "s"), so sentences with other tokens are checked with the regex,
+    and words that are not ASCII are looked up with the regex scan.
+    """
+
+    def __init__(self, text):
+        self.text = ' '.join(text.split())
+        self.spans = []
+        self.index = {}
+        # Sentences with tokens that are not ASCII, matched with the regex
+        self.unfolded = []
+
+        for sentence_id, match in enumerate(_SENTENCE_PATTERN.finditer(self.text)):
+            start, end = match.span()
+            self.spans.append((start, end))
+            for token in _TOKEN_PATTERN.finditer(self.text, start, end - 1):
+                # The regex needs at least one character before the word inside the sentence
+                if token.start() == start:
+                    continue
+                if not token.group().isascii():
+                    if not self.unfolded or self.unfolded[-1] != sentence_id:
+                        self.unfolded.append(sentence_id)
+                    continue
+                ids = self.index.setdefault(token.group().lower(), [])
+                if not ids or ids[-1] != sentence_id:
+                    ids.append(sentence_id)
+
+    def find(self, word):
+        """Return the sentences containing the word, or None."""
+        if not _TOKEN_PATTERN.fullmatch(word) or not word.isascii():
+            # Phrases, words with punctuation and words outside ASCII fall back to the regex scan
+            return get_sentence_with_word_regex(self.text, word)
+
+        sentence_ids = self.index.get(word.lower(), [])
+        if self.unfolded:
+            indexed = set(sentence_ids)
+            pattern = re.compile(f'\\b{re.escape(word)}\\b', re.IGNORECASE)
+            sentence_ids = sorted(sentence_ids + [
+                sentence_id for sentence_id in self.unfolded
+                if sentence_id not in indexed
+                and pattern.search(self.text, self.spans[sentence_id][0] + 1, self.spans[sentence_id][1] - 1)
+            ])
+
+        sentences = []
+        for sentence_id in sentence_ids:
+            start, end = self.spans[sentence_id]
+            sentence = re.sub(r'^[.!?\s]+|[.!?\s]+$', '', self.text[start:end].strip())
+            sentences.append(sentence)
+
+        return sentences if sentences else None
+
+
+def get_sentences_for_words(text, words):
+    """Map each word to the sentences containing it, skipping words without matches."""
+    sentence_index = SentenceIndex(text)
+    results = {}
+    for word in words:
+        sentences = sentence_index.find(word.lower())
+        if sentences:
+            results[word] = sentences
+    return results
+
+
+# Sentences of about this many words make the most useful card context
+_IDEAL_SENTENCE_WORDS = (6, 25)
+
+
+def score_sentence(sentence):
+    """Rate a sentence as card context: reasonable length and little OCR noise score higher."""
+    tokens = _TOKEN_PATTERN.findall(sentence)
+    if not tokens:
+        return 0.0
+    low, high = _IDEAL_SENTENCE_WORDS
+    if len(tokens) < low:
+        length_score = len(tokens) / low
+    elif len(tokens) > high:
+        length_score = high / len(tokens)
+    else:
+        length_score = 1.0
+    # OCR garbage shows up as symbols and single characters between the words
+    letters = sum(ch.isalpha() or ch.isspace() for ch in sentence)
+    clean_ratio = letters / len(sentence)
+    short_tokens = sum(len(token) == 1 for token in tokens) / len(tokens)
+    return length_score * clean_ratio * (1 - short_tokens / 2)
+
+
+def best_sentence(sentences):
+    """Return the highest scoring sentence, the earliest one on ties."""
+    return max(sentences, key=score_sentence) if sentences else None
+
+
+# Longest run of text without a sentence terminator kept while streaming. Longer runs
+# (tables, code, text without punctuation) are dropped instead of buffered.
+MAX_STREAM_SENTENCE_CHARS = 2000
+
+_TERMINATORS = '.!?~'
+
+
+def _clean_sentence(sentence):
+    return re.sub(r'^[.!?\s]+|[.!?\s]+$', '', ' '.join(sentence.split()))
+
+
+class SentenceStream:
+    """Incremental sentence segmentation of text that arrives in chunks.
+
+    feed() returns the sentences completed by a chunk and keeps the unfinished tail for the
+    next one, so a sentence split across chunks comes out whole. Sentences are segmented like
+    SentenceIndex (non-terminators closed by one terminator), whitespace normalized and
+    stripped of surrounding punctuation. A tail longer than max_sentence_chars is dropped up
+    to the next terminator, which bounds the memory used whatever the input.
+    """
+
+    def __init__(self, max_sentence_chars=MAX_STREAM_SENTENCE_CHARS):
+        self.max_sentence_chars = max_sentence_chars
+        self.dropped = 0
+        self._tail = ''
+        self._overflow = False
+
+    def feed(self, chunk):
+        """Return the sentences completed by this chunk."""
+        text = self._tail + chunk
+        end = max(text.rfind(terminator) for terminator in _TERMINATORS)
+        if end < 0:
+            self._keep_tail(text)
+            return []
+
+        sentences = []
+        for match in _SENTENCE_PATTERN.finditer(text, 0, end + 1):
+            if self._overflow or match.end() - match.start() > self.max_sentence_chars:
+                self._overflow = False
+                self.dropped += 1
+                continue
+            sentence = _clean_sentence(match.group())
+            if sentence:
+                sentences.append(sentence)
+        self._keep_tail(text[end + 1:])
+        return sentences
+
+    def close(self):
+        """Return the text after the last terminator as a final sentence, if any."""
+        tail, self._tail = self._tail, ''
+        if self._overflow:
+            self._overflow = False
+            return []
+        sentence = _clean_sentence(tail)
+        return [sentence] if sentence else []
+
+    def _keep_tail(self, tail):
+        if len(tail) > self.max_sentence_chars:
+            self._tail = ''
+            self._overflow = True
+        else:
+            self._tail = tail
+
+
+class BestSentences:
+    """Keep the best `limit` sentences for each word from a stream of sentences.
+
+    Sentences are ranked with score_sentence, the earlier one wins on ties, and each word
+    holds at most `limit` sentences in a min-heap, so memory does not grow with the number
+    of sentences added. Words match case-insensitively as whole words; phrases and words
+    with punctuation are matched with a regex.
+    """
+
+    def __init__(self, words, limit=1):
+        self.limit = max(1, limit)
+        self.count = 0
+        self._token_words = {}
+        self._phrases = []
+        for word in dict.fromkeys(words):
+            if _TOKEN_PATTERN.fullmatch(word):
+                self._token_words.setdefault(word.lower(), []).append(word)
+            else:
+                self._phrases.append((word, re.compile(f'\\b{re.escape(word)}\\b', re.IGNORECASE)))
+        self._best = {}
+
+    def add(self, sentence):
+        self.count += 1
+        tokens = {token.lower() for token in _TOKEN_PATTERN.findall(sentence)}
+        matched = [word for token in tokens.intersection(self._token_words) for word in self._token_words[token]]
+        matched.extend(word for word, pattern in self._phrases if pattern.search(sentence))
+        if not matched:
+            return
+
+        entry = (score_sentence(sentence), -self.count, sentence)
+        for word in matched:
+            heap = self._best.setdefault(word, [])
+            if any(kept == sentence for _, _, kept in heap):
+                continue
+            if len(heap) < self.limit:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    def sentences(self):
+        """Map each word to its best sentences, best first, skipping words without matches."""
+        return {
+            word: [sentence for _, _, sentence in sorted(heap, reverse=True)]
+            for word, heap in self._best.items()
+        }
@@ -1,19 +1,89 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import chat, create_card
+from app.api.endpoints import chat, create_card, jobs
+from app.api.dependencies import create_job_service
 from app.config.settings import get_settings
+from app.services.ocr_executor import get_ocr_executor
+from app.services.gemini_service import GeminiService
+from app.services.create_card_service import CreateCardService, MAX_IMAGE_SIZE
+from app.api.uploads import BodySizeLimitMiddleware
+from app.image_to_text.ocr_cache import get_ocr_cache
+from app.monitoring import metrics
+from app.monitoring.middleware import MetricsMiddleware
+from app.monitoring.profiler import SlowRequestProfiler
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import logging
+import time
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One Gemini client and one card service for the whole app, shared by every request
+    gemini_service = GeminiService()
+    app.state.gemini_service = gemini_service
+    app.state.create_card_service = CreateCardService(gemini_service=gemini_service)
+    # Background card jobs, resuming any left unfinished by a previous run
+    app.state.job_service = create_job_service(app.state.create_card_service)
+    app.state.job_service.start()
+    maintenance_task = asyncio.create_task(gemini_service.run_maintenance())
+    if app.state.profiler is not None:
+        app.state.profiler.start()
+
+    # Start the OCR process pool, load tesseract in every worker and load the Gemini client,
+    # before serving or once the server accepts connections depending on STARTUP_MODE
+    ocr_executor = get_ocr_executor()
+    startup_mode = get_settings().STARTUP_MODE
+    warm_up_task = None
+    if startup_mode == "lazy":
+        app.state.readiness = {"ocr": "lazy", "gemini": "lazy"}
+    else:
+        app.state.readiness = {"ocr": "loading", "gemini": "loading"}
+        warm_up = warm_up_services(app.state.readiness, ocr_executor, gemini_service)
+        if startup_mode == "eager":
+            await warm_up
+        else:
+            warm_up_task = asyncio.create_task(warm_up)
+    yield
+
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warm_up_task
+    await app.state.job_service.stop()
+    app.state.job_service.store.close()
+    maintenance_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await maintenance_task
+    ocr_executor.shutdown()
+    gemini_service.close()
+
+# Warm up the OCR workers and the Gemini client, recording in readiness which ones are loaded
+async def warm_up_services(readiness: dict, ocr_executor, gemini_service: GeminiService):
+    async def load(name: str, warm_up):
+        started = time.perf_counter()
+        try:
+            await warm_up
+            readiness[name] = "ready"
+            logger.info(f"{name} loaded in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            readiness[name] = f"failed: {str(e)}"
+            logger.error(f"{name} warm-up failed: {str(e)}")
+
+    await asyncio.gather(load("ocr", ocr_executor.warm_up()), load("gemini", gemini_service.warm_up()))
+
 def create_application() -> FastAPI:
+    settings = get_settings()
     
     app = FastAPI(
         title="Flash Card API",
         description="AI-powered language learning flashcard generator",
-        version="1.0.0"
+        version="1.0.0",
+        lifespan=lifespan
     )
     
     # CORS middleware for frontend
@@ -25,8 +95,33 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # Oversized uploads are rejected while they arrive, single image endpoints get the image
+    # limit plus room for the form fields
+    app.add_middleware(
+        BodySizeLimitMiddleware,
+        default_limit=settings.MAX_REQUEST_SIZE,
+        limits=[("/api/cards/image", MAX_IMAGE_SIZE + 64 * 1024)],
+    )
+    
+    # Stage timings and the slow request profiler, not installed at all when disabled
+    metrics.configure(settings.METRICS_ENABLED)
+    app.state.profiler = None
+    if settings.PROFILE_SLOW_REQUESTS_MS > 0:
+        app.state.profiler = SlowRequestProfiler(
+            threshold=settings.PROFILE_SLOW_REQUESTS_MS / 1000,
+            interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+            output_dir=settings.PROFILE_DIR
+        )
+    if settings.METRICS_ENABLED or app.state.profiler is not None:
+        app.add_middleware(
+            MetricsMiddleware,
+            timed_prefixes=("/api/cards", "/api/chat"),
+            profiler=app.state.profiler
+        )
+    
     # Include routers
     app.include_router(create_card.router, prefix="/api/cards", tags=["cards"])
+    app.include_router(jobs.router, prefix="/api/cards", tags=["jobs"])
     app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
     
     return app
@@ -43,4 +138,48 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "service": "flash-card-api"}
\ No newline at end of file
+    return {"status": "healthy", "service": "flash-card-api"}
+
+@app.get("/health/ready")
+def readiness_check(request: Request):
+    # 200 once the OCR workers and the Gemini client are loaded (or left to load on first use)
+    readiness = dict(getattr(request.app.state, "readiness", {}))
+    # A failed OCR warm-up stays failed until an OCR job succeeds
+    if readiness.get("ocr", "").startswith("failed") and get_ocr_executor().warm_up_error is None:
+        readiness["ocr"] = "ready"
+    if not readiness or "loading" in readiness.values():
+        status = "starting"
+    elif all(state in ("ready", "lazy") for state in readiness.values()):
+        status = "ready"
+    else:
+        status = "failed"
+    return JSONResponse(status_code=200 if status == "ready" else 503, content={"status": status, "components": readiness})
+
+@app.get("/health/gemini")
+def gemini_health(request: Request):
+    # Outbound scheduler state: queue depth per lane, concurrency window and throttling counters
+    gemini_service = getattr(request.app.state, "gemini_service", None)
+    if gemini_service is None:
+        raise HTTPException(status_code=503, detail="Gemini service not started")
+    return gemini_service.scheduler.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics(request: Request):
+    # Stage and request latency histograms plus the counters of the shared services
+    state = request.app.state
+    gauges = {"ocr_executor": get_ocr_executor().stats(), "ocr_cache": get_ocr_cache().stats()}
+    gemini_service = getattr(state, "gemini_service", None)
+    if gemini_service is not None:
+        gauges["gemini"] = gemini_service.scheduler.stats()
+        gauges["card_generation"] = gemini_service.card_stats()
+        backend_stats = gemini_service.backend_stats()
+        if backend_stats is not None:
+            gauges["llm_backend"] = backend_stats
+        gauges["card_cache"] = gemini_service.card_cache.stats()
+        if gemini_service.lexicon is not None:
+            gauges["lexicon"] = gemini_service.lexicon.stats()
+        gauges["sessions"] = gemini_service.session_store.stats()
+    job_service = getattr(state, "job_service", None)
+    if job_service is not None:
+        gauges["jobs"] = job_service.stats()
+    return PlainTextResponse(metrics.render_metrics(gauges), media_type="text/plain; version=0.0.4")
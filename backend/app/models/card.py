@@ -13,4 +13,6 @@ class Card(BaseModel):
     synonyms: Optional[str] = None
     sentence: Optional[str] = None
     t_sentence: Optional[str] = None
+    # True when every field came from the local lexicon, without a Gemini call
+    from_lexicon: bool = False
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
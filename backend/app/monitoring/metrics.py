@@ -0,0 +1,174 @@
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds, from 1 ms to one minute
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Histogram bucket upper bounds for token counts
+TOKEN_BUCKETS = (25, 50, 100, 200, 400, 800, 1600, 3200, 6400)
+
+# Set by configure(), histograms are only updated when metrics are enabled
+_enabled = False
+
+# Stage timings of the current request (for Server-Timing) or of the current OCR job, if collected
+_collector: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("stage_timings", default=None)
+
+
+# Cumulative histogram in the Prometheus text format, with one series per label value
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Bucket counts, then the sum and the count of all observations
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, [list(data[0]), data[1], data[2]]) for labels, data in self._series.items())
+        for labels, (counts, total, count) in series:
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("flashcard_stage_seconds", "Time spent in each stage of request processing", ("stage",))
+REQUEST_SECONDS = Histogram("flashcard_request_seconds", "HTTP request latency", ("method", "route", "status"))
+CARD_TOKENS = Histogram("flashcard_card_tokens", "Gemini tokens per generated card", ("kind",), TOKEN_BUCKETS)
+
+
+def configure(enabled: bool):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def observe(name: str, seconds: float):
+    if _enabled:
+        STAGE_SECONDS.observe((name,), seconds)
+    timings = _collector.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+# Tokens of a Gemini card generation call per card, kind is "prompt" or "output"
+def observe_tokens(kind: str, tokens: float):
+    if _enabled:
+        CARD_TOKENS.observe((kind,), tokens)
+
+
+# Record timings measured elsewhere, e.g. returned by an OCR worker process
+def record_timings(timings: Iterable[Tuple[str, float]]):
+    for name, seconds in timings:
+        observe(name, seconds)
+
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.started)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+# Time a block of code as a named stage:
+#     with stage("decode"):
+#         ...
+# When metrics are disabled and nothing collects timings this is a no-op.
+def stage(name: str):
+    if not _enabled and _collector.get() is None:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+# Collect the stage timings of the code run inside the block (and tasks it starts)
+class collect_timings:
+    def __enter__(self) -> List[Tuple[str, float]]:
+        self.timings = []
+        self._token = _collector.set(self.timings)
+        return self.timings
+
+    def __exit__(self, *exc_info):
+        _collector.reset(self._token)
+
+
+# Server-Timing header value, durations of repeated stages are added up
+def server_timing(timings: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    durations: Dict[str, float] = {}
+    for name, seconds in timings:
+        durations[name] = durations.get(name, 0.0) + seconds
+    if total is not None:
+        durations["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items())
+
+
+# Prometheus text exposition of the histograms plus gauges from the services' stats()
+# gauges maps a component name to its stats dict. Nested dicts become a label, e.g.
+# {"scheduler": {"queue_depth": {"bulk": 3}}} -> flashcard_scheduler_queue_depth{key="bulk"} 3
+def render_metrics(gauges: Dict[str, Dict]) -> str:
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render() + CARD_TOKENS.render()
+    for component, stats in gauges.items():
+        for key, value in stats.items():
+            name = f"flashcard_{component}_{key}"
+            if isinstance(value, dict):
+                samples = [(f'{{key="{_escape(str(label))}"}}', sample) for label, sample in value.items()]
+            else:
+                samples = [("", value)]
+            samples = [(labels, sample) for labels, sample in samples if _is_number(sample)]
+            if samples:
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{labels} {float(sample)}" for labels, sample in samples)
+    return "\n".join(lines) + "\n"
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,65 @@
+import time
+from typing import Optional, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.monitoring.metrics import REQUEST_SECONDS, collect_timings, server_timing
+from app.monitoring.profiler import SlowRequestProfiler
+
+
+# Request latency histograms, Server-Timing headers and the slow request profiler
+# Responses of paths under timed_prefixes get a Server-Timing header with the stages that
+# finished before the response started (for streamed responses, the stages before the first byte).
+class MetricsMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        timed_prefixes: Tuple[str, ...] = (),
+        profiler: Optional[SlowRequestProfiler] = None
+    ):
+        self.app = app
+        self.timed_prefixes = timed_prefixes
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        add_header = scope["path"].startswith(self.timed_prefixes)
+        profile_started = self.profiler.request_started() if self.profiler else None
+
+        with collect_timings() as timings:
+            async def timed_send(message: Message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if add_header:
+                        header = server_timing(timings, time.perf_counter() - started)
+                        message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, timed_send)
+            finally:
+                REQUEST_SECONDS.observe((scope["method"], _route_template(scope), str(status)), time.perf_counter() - started)
+                if self.profiler:
+                    self.profiler.request_finished(profile_started, f"{scope['method']} {scope['path']}")
+
+
+# Template of the matched route, e.g. /api/cards/jobs/{job_id}, which keeps the label set bounded
+# The route in the scope may be the one declared on an included router, without the include
+# prefix, so the prefix is recovered from the part of the path in front of the route's own match.
+def _route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    try:
+        matched = route.path_format.format(**scope.get("path_params", {}))
+    except (AttributeError, KeyError, IndexError, ValueError):
+        return template
+    path = scope["path"]
+    if matched and path.endswith(matched):
+        return path[:len(path) - len(matched)] + template
+    return template
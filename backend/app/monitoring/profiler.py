@@ -0,0 +1,95 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Stack frames kept per sample, innermost last
+MAX_STACK_DEPTH = 64
+
+
+# Sampling profiler for slow requests
+# While requests are in flight a daemon thread samples the stack of the event loop thread every
+# interval seconds into a ring buffer. When a request takes longer than threshold seconds, the
+# samples taken during it are written to output_dir in the collapsed-stack format read by
+# flamegraph tools and the most frequent stacks are logged. The event loop is shared, so the
+# samples show everything the loop did while the slow request was open, not only that request;
+# work in the OCR process pool is not sampled.
+class SlowRequestProfiler:
+    def __init__(self, threshold: float, interval: float = 0.005, output_dir: Optional[str] = None, max_samples: int = 20000):
+        self.threshold = threshold
+        self.interval = interval
+        self.output_dir = output_dir
+        self._samples = deque(maxlen=max_samples)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread_id = None
+        self._sampler = None
+        self.profiles_written = 0
+
+    # Call from the event loop thread before the first request
+    def start(self):
+        if self._sampler is not None:
+            return
+        self._thread_id = threading.get_ident()
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+        self._sampler = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._sampler.start()
+
+    def request_started(self) -> float:
+        with self._lock:
+            self._active += 1
+            self._wake.set()
+        return time.monotonic()
+
+    def request_finished(self, started: float, description: str):
+        finished = time.monotonic()
+        with self._lock:
+            self._active -= 1
+            if not self._active:
+                self._wake.clear()
+        if finished - started >= self.threshold:
+            self._report(started, finished, description)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._samples.append((time.monotonic(), _collapse(frame)))
+            time.sleep(self.interval)
+
+    def _report(self, started: float, finished: float, description: str):
+        stacks = Counter(stack for sampled_at, stack in list(self._samples) if started <= sampled_at <= finished)
+        if not stacks:
+            return
+        duration_ms = (finished - started) * 1000
+        top = "\n".join(f"  {count:5d}  {stack.rsplit(';', 1)[-1]}" for stack, count in stacks.most_common(5))
+        logger.warning(f"Slow request {description} took {duration_ms:.0f} ms, top sampled frames:\n{top}")
+
+        if self.output_dir:
+            safe_name = "".join(ch if ch.isalnum() else "_" for ch in description)[:80]
+            path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}-{duration_ms:.0f}ms.folded")
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    for stack, count in stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+                self.profiles_written += 1
+            except OSError as e:
+                logger.warning(f"Could not write profile {path}: {str(e)}")
+
+
+# "outer;...;inner" with one "function (file:line)" entry per frame
+def _collapse(frame) -> str:
+    entries = []
+    while frame is not None and len(entries) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        entries.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(entries))
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from app.config.settings import get_settings
+from app.models.card import Card
+
+# Fields that are not part of the generated content and are never cached
+UNCACHED_FIELDS = {"card_id", "created_at"}
+
+
+# Normalize free text so that casing and whitespace differences share one cache entry
+def normalize_text(text: Optional[str]) -> str:
+    if not text:
+        return ""
+    return " ".join(text.split()).lower()
+
+
+# Build the cache key for a card request
+def make_card_key(word: str, sentence: Optional[str], n_language: str, l_language: str) -> str:
+    raw = "\x1f".join([
+        normalize_text(word),
+        normalize_text(sentence),
+        normalize_text(n_language),
+        normalize_text(l_language),
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# Two-tier cache for generated cards
+# Tier 1 is an in-process LRU with TTL, tier 2 is a SQLite file shared by all workers.
+# Every entry records the prompt version it was generated with, entries from other
+# versions are treated as misses and, like entries older than the TTL, are purged with
+# invalidate(), which runs when the cache is created.
+# Memory hits are served on the calling thread, the SQLite tier is read and written in a
+# worker thread so disk I/O never blocks the event loop.
+class CardCache:
+    def __init__(self, db_path: Optional[str], prompt_version: str, max_entries: int = 1024, ttl: float = 7 * 24 * 3600):
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Separate from _lock, so memory hits do not wait for a disk read or write in progress
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # In WAL mode NORMAL only syncs at checkpoints, a put does not wait for an fsync
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS cards (
+                    key TEXT PRIMARY KEY,
+                    prompt_version TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+
+    async def get(self, word: str, sentence: Optional[str], n_language: str, l_language: str) -> Optional[Card]:
+        return (await self.get_many([(word, sentence)], n_language, l_language))[0]
+
+    # Cached cards for (word, sentence) pairs, None for misses
+    # Keys missing from memory are looked up on disk together, in one worker thread call.
+    async def get_many(self, items: List[Tuple[str, Optional[str]]], n_language: str, l_language: str) -> List[Optional[Card]]:
+        keys = [make_card_key(word, sentence, n_language, l_language) for word, sentence in items]
+        now = time.time()
+        found: Dict[str, dict] = {}
+
+        with self._lock:
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is None:
+                    continue
+                data, stored_at = entry
+                if now - stored_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    found[key] = data
+                else:
+                    del self._memory[key]
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self._db is not None:
+            rows = await asyncio.to_thread(self._read_disk, missing)
+            with self._lock:
+                for key, (data, created_at) in rows.items():
+                    if now - created_at <= self.ttl:
+                        self._remember(key, data, created_at)
+                        found[key] = data
+                        self.disk_hits += 1
+
+        cards = []
+        for key in keys:
+            data = found.get(key)
+            if data is None:
+                self.misses += 1
+                cards.append(None)
+            else:
+                self.hits += 1
+                cards.append(Card(**data))
+        return cards
+
+    async def put(self, card: Card, word: str, sentence: Optional[str], n_language: str, l_language: str):
+        await self.put_many([(card, word, sentence)], n_language, l_language)
+
+    # Store cards given as (card, word, sentence), written to disk in one transaction
+    async def put_many(self, entries: List[Tuple[Card, str, Optional[str]]], n_language: str, l_language: str):
+        now = time.time()
+        rows = []
+        with self._lock:
+            for card, word, sentence in entries:
+                key = make_card_key(word, sentence, n_language, l_language)
+                data = card.model_dump(exclude=UNCACHED_FIELDS)
+                self._remember(key, data, now)
+                rows.append((key, self.prompt_version, json.dumps(data), now))
+        if rows and self._db is not None:
+            await asyncio.to_thread(self._write_disk, rows)
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, tuple]:
+        rows = {}
+        with self._db_lock:
+            for key in keys:
+                row = self._db.execute(
+                    "SELECT data, created_at FROM cards WHERE key = ? AND prompt_version = ?",
+                    (key, self.prompt_version)
+                ).fetchone()
+                if row is not None:
+                    rows[key] = (json.loads(row[0]), row[1])
+        return rows
+
+    def _write_disk(self, rows: List[tuple]):
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO cards (key, prompt_version, data, created_at) VALUES (?, ?, ?, ?)", rows
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    # Drop cached cards. By default only entries generated with another prompt version or
+    # older than the TTL are removed, pass all_versions=True to empty the cache completely.
+    def invalidate(self, all_versions: bool = False) -> int:
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            if self._db is None:
+                return 0
+            if all_versions:
+                cursor = self._db.execute("DELETE FROM cards")
+            else:
+                cursor = self._db.execute(
+                    "DELETE FROM cards WHERE prompt_version != ? OR created_at < ?",
+                    (self.prompt_version, time.time() - self.ttl)
+                )
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, data: dict, stored_at: float):
+        self._memory[key] = (data, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+
+@lru_cache()
+def get_card_cache(prompt_version: str) -> CardCache:
+    settings = get_settings()
+    cache = CardCache(
+        db_path=settings.CARD_CACHE_PATH or None,
+        prompt_version=prompt_version,
+        max_entries=settings.CARD_CACHE_SIZE,
+        ttl=settings.CARD_CACHE_TTL,
+    )
+    # Entries written by an older prompt template are never served again
+    cache.invalidate()
+    return cache
@@ -0,0 +1,76 @@
+import math
+from typing import Awaitable, Callable, Dict, List
+
+# Messages at the start of a session that are never compacted:
+# the word/sentence analysis prompt and the model's analysis
+PINNED_MESSAGES = 2
+
+# Marks the user message that carries the summary of compacted turns
+SUMMARY_PREFIX = "Summary of our earlier conversation:"
+SUMMARY_ACK = "Understood, I will keep this in mind."
+
+
+# Rough token count of a text, about four characters per token for Gemini tokenizers
+# Counting locally keeps the budget check free of extra API round trips.
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+def history_tokens(history: List[Dict]) -> int:
+    return sum(estimate_tokens(part) for message in history for part in message["parts"])
+
+
+def is_summary(message: Dict) -> bool:
+    return message["role"] == "user" and bool(message["parts"]) and message["parts"][0].startswith(SUMMARY_PREFIX)
+
+
+# Keeps serialized chat histories (see serialize_history) within a token budget
+# The pinned analysis context and the last window_turns exchanges are kept verbatim. Once the
+# history exceeds token_budget, everything in between (including a previous summary) is
+# folded into one summary exchange, so the prompt resent on every turn stays bounded however
+# long the session runs. Turns beyond the window are kept until then, so the summarization
+# call is made once per budget overflow rather than on every turn.
+class ChatHistoryManager:
+    def __init__(self, token_budget: int, window_turns: int):
+        self.token_budget = token_budget
+        self.window_turns = window_turns
+
+    def needs_compaction(self, history: List[Dict]) -> bool:
+        middle = self._split(history)[1]
+        if not middle or (len(middle) == 2 and is_summary(middle[0])):
+            return False
+        return history_tokens(history) > self.token_budget
+
+    # Return the compacted history, summarize receives the transcript of the folded turns
+    async def compact(self, history: List[Dict], summarize: Callable[[str], Awaitable[str]]) -> List[Dict]:
+        pinned, middle, recent = self._split(history)
+        if not middle:
+            return history
+
+        summary = await summarize(self._transcript(middle))
+        return pinned + [
+            {"role": "user", "parts": [f"{SUMMARY_PREFIX}\n{summary.strip()}"]},
+            {"role": "model", "parts": [SUMMARY_ACK]},
+        ] + recent
+
+    # Split into (pinned, compactable, recent) message lists
+    # Turns are user/model pairs, so the recent window always starts with a user message.
+    def _split(self, history: List[Dict]):
+        pinned = history[:PINNED_MESSAGES]
+        rest = history[PINNED_MESSAGES:]
+        keep = min(len(rest), 2 * self.window_turns)
+        keep -= keep % 2
+        split_at = len(rest) - keep
+        return pinned, rest[:split_at], rest[split_at:]
+
+    @staticmethod
+    def _transcript(messages: List[Dict]) -> str:
+        lines = []
+        for message in messages:
+            text = "\n".join(message["parts"])
+            if is_summary(message):
+                lines.append(f"Earlier summary: {text[len(SUMMARY_PREFIX):].strip()}")
+            elif message["parts"] != [SUMMARY_ACK]:
+                speaker = "Student" if message["role"] == "user" else "Tutor"
+                lines.append(f"{speaker}: {text}")
+        return "\n".join(lines)
@@ -1,22 +1,62 @@
-import cv2
-import numpy as np
-from PIL import Image
-import io
-from app.image_to_text.image_to_text import image_to_text
-from app.image_to_text.text_operations import get_sentence_with_word_regex
+from app.image_to_text.text_operations import (
+    BestSentences, SentenceStream, best_sentence, get_sentences_for_words, select_blocks_with_words
+)
 from app.services.gemini_service import GeminiService
+from app.services.ocr_executor import OCRQueueFullError, get_ocr_executor
+from app.image_to_text.ocr_cache import get_ocr_cache
 from app.models.card import Card
+from app.monitoring.metrics import observe, stage
+import codecs
 import os
+import time
 import uuid
-from typing import Dict, List  
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from app.config.settings import get_settings
 
 # Constants for image and text processing limits
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  
 MAX_TEXT_LENGTH = 1000  
 
+# Documents are read in pieces of this size, and at most this many context sentences
+# (and cards) are kept per word
+DOCUMENT_CHUNK_SIZE = 64 * 1024
+MAX_SENTENCES_PER_WORD = 5
+
+# Pages OCRed ahead of card generation in stream_cards_from_pages
+PIPELINE_OCR_AHEAD = 2
+
+# Times OCR is retried when the OCR pool is full, for work that is not tied to a client request
+MAX_OCR_ATTEMPTS = 3
+
+
+# Raise ValueError unless words is a non-empty list
+def validate_words(words: List[str]):
+    if not words or not isinstance(words, list):
+        raise ValueError("Words must be a non-empty list")
+
+
+# Raise ValueError for a text request the card endpoints reject: empty text, no words or
+# text longer than MAX_TEXT_LENGTH
+def validate_text_request(text: str, words: List[str]):
+    if not text or not text.strip():
+        raise ValueError("Empty text content")
+    validate_words(words)
+    if len(text) > MAX_TEXT_LENGTH:
+        raise ValueError(f"Text length exceeds maximum limit of {MAX_TEXT_LENGTH} characters")
+
 class CreateCardService:
-    def __init__(self):
-        self.gemini_service = GeminiService()
+    def __init__(
+        self,
+        gemini_service: Optional[GeminiService] = None,
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        settings = get_settings()
+        self.gemini_service = gemini_service or GeminiService()
+        self.concurrency = concurrency or settings.CARD_GENERATION_CONCURRENCY
+        self.batch_size = batch_size or settings.CARD_BATCH_SIZE
         
     async def process_image_and_create_cards(
         self, 
@@ -42,45 +82,12 @@ class CreateCardService:
         sentences = extracted_data["sentences"]
         
         
-        cards = []
-        
-        # Create cards for each word
-        for word in words:
-            try:
-                # Find sentences for the word
-                word_sentences = sentences.get(word, [])
-                if not word_sentences:
-                    # If no sentences found, create card with None
-                    word_sentences = [None]
-                for context_sentence in word_sentences:
-                    try:
-                        card_details = await self.gemini_service.generate_card(
-                            word=word,
-                            n_language=n_language,
-                            l_language=l_language,
-                            sentence=context_sentence
-                        )
-                        card = Card(
-                            word=card_details.word,
-                            t_word=card_details.t_word,
-                            description=card_details.description,
-                            synonyms=card_details.synonyms,
-                            sentence=card_details.sentence,
-                            t_sentence=card_details.t_sentence,
-                            pronunciation=card_details.pronunciation,
-                            part_of_speech=card_details.part_of_speech,
-                    
-                        )
-                        
-                        cards.append(card)
-                    except Exception as e:
-                        print(f"Error processing word '{word}' with sentence '{context_sentence}': {str(e)}")
-                        continue
-            except Exception as e:
-                print(f"Error creating card for word '{word}': {str(e)}")
-                continue
-                
-        return cards
+        return await self.create_cards_from_sentences(
+            words=words,
+            sentences=sentences,
+            n_language=n_language,
+            l_language=l_language
+        )
 
 
     async def process_text_and_create_cards(
@@ -91,59 +98,372 @@ class CreateCardService:
         l_language: str = "English"
     ) -> List[Card]:
        
+        extracted_data = self.extract_sentences_from_text(text, words)
         
-        if not text or not text.strip():
-            raise ValueError("Empty text content")
-            
-        if not words or not isinstance(words, list):
-            raise ValueError("Words must be a non-empty list")
-        
-        if len(text) > MAX_TEXT_LENGTH:
-            raise ValueError(f"Text length exceeds maximum limit of {MAX_TEXT_LENGTH} characters")
-    
-        cards = []
-        sentences = {}
-        
+        return await self.create_cards_from_sentences(
+            words=words,
+            sentences=extracted_data["sentences"],
+            n_language=n_language,
+            l_language=l_language
+        )
+
+    # Validate the text request and find the sentences for each word
+    def extract_sentences_from_text(self, text: str, words: List[str]) -> Dict[str, any]:
+        validate_text_request(text, words)
+
         # Find sentences for each word
-        for word in words:
-            word_sentences = get_sentence_with_word_regex(text, word.lower())
-            if word_sentences:
-                sentences[word] = word_sentences
-        
-        # Create cards for each word
-        for word in words:
+        return {
+            "text": text,
+            "sentences": self._find_sentences(text, words)
+        }
+
+    # Create cards for the words of a long document (article, e-book chapter) read in chunks
+    # Returns the cards and the extraction summary of extract_sentences_from_chunks.
+    async def process_document_and_create_cards(
+        self,
+        chunks: AsyncIterator[bytes],
+        words: List[str],
+        n_language: str = "Turkish",
+        l_language: str = "English",
+        sentences_per_word: int = 1
+    ) -> Tuple[List[Card], Dict]:
+
+        extracted_data = await self.extract_sentences_from_chunks(chunks, words, sentences_per_word)
+        cards = await self.create_cards_from_sentences(
+            words=words,
+            sentences=extracted_data["sentences"],
+            n_language=n_language,
+            l_language=l_language
+        )
+        return cards, extracted_data
+
+    # Find the best sentences for each word in UTF-8 text that arrives in chunks of bytes
+    # Text is decoded and split into sentences incrementally, and only the unfinished sentence
+    # at the end of the last chunk plus the best sentences_per_word sentences of each word are
+    # kept, so memory does not grow with the size of the document.
+    async def extract_sentences_from_chunks(
+        self,
+        chunks: AsyncIterator[bytes],
+        words: List[str],
+        sentences_per_word: int = 1
+    ) -> Dict[str, any]:
+        validate_words(words)
+        if not 1 <= sentences_per_word <= MAX_SENTENCES_PER_WORD:
+            raise ValueError(f"sentences_per_word must be between 1 and {MAX_SENTENCES_PER_WORD}")
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        splitter = SentenceStream()
+        best = BestSentences(words, sentences_per_word)
+        characters = 0
+        has_text = False
+        extraction_time = 0.0
+
+        def add_sentences(sentences: List[str]):
+            for sentence in sentences:
+                best.add(sentence)
+
+        async for chunk in chunks:
+            text = decoder.decode(chunk)
+            if not text:
+                continue
+            characters += len(text)
+            has_text = has_text or not text.isspace()
+            started = time.perf_counter()
+            # Segmenting and scoring a chunk is CPU work, keep it off the event loop
+            await asyncio.to_thread(lambda: add_sentences(splitter.feed(text)))
+            extraction_time += time.perf_counter() - started
+
+        text = decoder.decode(b"", final=True)
+        characters += len(text)
+        has_text = has_text or (bool(text) and not text.isspace())
+        add_sentences(splitter.feed(text) + splitter.close())
+        if not has_text:
+            raise ValueError("Empty text content")
+        observe("sentence_extraction", extraction_time)
+
+        return {
+            "sentences": best.sentences(),
+            "characters": characters,
+            "sentence_count": best.count,
+            "dropped_fragments": splitter.dropped,
+        }
+
+    # Generate cards for every (word, sentence) pair concurrently
+    # Jobs are dispatched at once but at most `concurrency` Gemini calls run at a time.
+    # With batching enabled, jobs are grouped into multi-word Gemini calls instead.
+    # Cards are returned in the same order as the serial loop would produce them.
+    async def create_cards_from_sentences(
+        self,
+        words: List[str],
+        sentences: Dict[str, List[str]],
+        n_language: str = "Turkish",
+        l_language: str = "English"
+    ) -> List[Card]:
+
+        jobs = self._build_jobs(words, sentences)
+
+        if self.batch_size > 1:
             try:
-                # Find sentences for the word
-                word_sentences = sentences.get(word, [])
-                if not word_sentences:
-                    # If no sentences found, create card with None
-                    word_sentences = [None]
-                for context_sentence in word_sentences:
+                generated = await self.gemini_service.generate_cards(
+                    items=jobs,
+                    n_language=n_language,
+                    l_language=l_language,
+                    concurrency=self.concurrency,
+                    batch_size=self.batch_size
+                )
+            except Exception as e:
+                print(f"Error generating card batch: {str(e)}")
+                generated = []
+        else:
+            semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+            async def run_job(word: str, context_sentence: Optional[str]) -> Optional[Card]:
+                async with semaphore:
                     try:
-                        card_details = await self.gemini_service.generate_card(
+                        return await self.gemini_service.generate_card(
                             word=word,
                             n_language=n_language,
                             l_language=l_language,
                             sentence=context_sentence
                         )
-                        card = Card(
-                            word=card_details.word,
-                            t_word=card_details.t_word,
-                            description=card_details.description,
-                            synonyms=card_details.synonyms,
-                            sentence=card_details.sentence,
-                            t_sentence=card_details.t_sentence
-                        )
-                        
-                        cards.append(card)
                     except Exception as e:
                         print(f"Error processing word '{word}' with sentence '{context_sentence}': {str(e)}")
+                        return None
+
+            generated = await asyncio.gather(*(run_job(word, sentence) for word, sentence in jobs))
+
+        return [self._to_card(card_details) for card_details in generated if card_details is not None]
+
+    # Generate cards like create_cards_from_sentences but yield events as soon as each card is ready
+    # Yields {"event": "card", "index", "card"} per card, in completion order, where index is the
+    # position the card has in the non-streaming result, then one {"event": "summary"} listing failures.
+    async def stream_cards_from_sentences(
+        self,
+        words: List[str],
+        sentences: Dict[str, List[str]],
+        n_language: str = "Turkish",
+        l_language: str = "English"
+    ) -> AsyncIterator[Dict]:
+
+        jobs = self._build_jobs(words, sentences)
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def run_job(index: int, word: str, context_sentence: Optional[str]):
+            async with semaphore:
+                card, error = await self._generate_card_or_error(word, context_sentence, n_language, l_language)
+            return index, word, context_sentence, card, error
+
+        tasks = [
+            asyncio.create_task(run_job(index, word, sentence))
+            for index, (word, sentence) in enumerate(jobs)
+        ]
+        failures = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, word, context_sentence, card, error = await next_done
+                if card is None:
+                    print(f"Error processing word '{word}' with sentence '{context_sentence}': {error}")
+                    failures.append({"index": index, "word": word, "sentence": context_sentence, "error": error})
+                    continue
+                yield {"event": "card", "index": index, "card": card.model_dump(mode="json")}
+
+            yield {
+                "event": "summary",
+                "total": len(jobs),
+                "created": len(jobs) - len(failures),
+                "failures": sorted(failures, key=lambda failure: failure["index"])
+            }
+        finally:
+            # Stop outstanding generations when the client goes away
+            for task in tasks:
+                task.cancel()
+
+    # Generate cards for a multi-page document (see app.image_to_text.pages.split_pages)
+    # OCR and card generation run as a pipeline: while the cards of one page are generated
+    # the next pages are already in OCR. The stages are connected by bounded queues and card
+    # generation by a semaphore, so a slow stage holds back the ones before it instead of
+    # buffering pages. Each word gets one card, for the best sentence of the first page it
+    # appears on; words found on no page get a card without context at the end.
+    # Yields a "page" event per page, "card" events in completion order and a final "summary".
+    # When the pages cannot be read an "error" event with the failing page comes before the
+    # summary, and the cards of the pages read so far are still generated.
+    async def stream_cards_from_pages(
+        self,
+        pages: Iterator[bytes],
+        words: List[str],
+        n_language: str = "Turkish",
+        l_language: str = "English"
+    ) -> AsyncIterator[Dict]:
+
+        words = list(dict.fromkeys(words))
+        ocr_results = asyncio.Queue(maxsize=PIPELINE_OCR_AHEAD)
+        events = asyncio.Queue(maxsize=2 * max(1, self.concurrency))
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        card_tasks = []
+        failures = []
+        # Set when the pages could not be read (e.g. a corrupt TIFF), pages after it are lost
+        document_error = {}
+        done = object()
+
+        async def extract_page(page_index: int, content: bytes):
+            try:
+                return page_index, await self.extract_sentences_when_ready(content, words), None
+            except Exception as e:
+                return page_index, None, str(e)
+
+        # Stage 1: split and OCR pages in order, keeping up to PIPELINE_OCR_AHEAD pages in flight
+        # The end of the pages is always signalled with None, also when reading them fails, so
+        # the generation stage never waits for pages that will not come.
+        async def ocr_stage():
+            in_flight = deque()
+            page_index = 0
+            try:
+                page_iterator = iter(pages)
+                while True:
+                    try:
+                        content = await asyncio.to_thread(next, page_iterator, None)
+                    except Exception as e:
+                        # The pages read so far are still delivered
+                        document_error.update(page=page_index, error=f"Error reading page {page_index + 1}: {str(e)}")
+                        break
+                    if content is None:
+                        break
+                    in_flight.append(asyncio.create_task(extract_page(page_index, content)))
+                    page_index += 1
+                    if len(in_flight) >= PIPELINE_OCR_AHEAD:
+                        await ocr_results.put(await in_flight.popleft())
+                while in_flight:
+                    await ocr_results.put(await in_flight.popleft())
+            except Exception as e:
+                document_error.setdefault("page", page_index)
+                document_error.setdefault("error", str(e))
+            finally:
+                # Only left over after an error or cancellation
+                for task in in_flight:
+                    task.cancel()
+            await ocr_results.put(None)
+
+        async def generate(index: int, page_index: Optional[int], word: str, context_sentence: Optional[str]):
+            try:
+                card, error = await self._generate_card_or_error(word, context_sentence, n_language, l_language)
+            finally:
+                semaphore.release()
+            if card is None:
+                failures.append({"index": index, "page": page_index, "word": word, "sentence": context_sentence, "error": error})
+            else:
+                await events.put({"event": "card", "index": index, "page": page_index, "card": card.model_dump(mode="json")})
+
+        async def start_card(page_index: Optional[int], word: str, context_sentence: Optional[str]):
+            await semaphore.acquire()
+            card_tasks.append(asyncio.create_task(generate(len(card_tasks), page_index, word, context_sentence)))
+
+        # Stage 2: pick new words on each page and start their cards
+        async def generation_stage():
+            try:
+                assigned = set()
+                pages_seen = 0
+                while (page := await ocr_results.get()) is not None:
+                    page_index, extracted, error = page
+                    pages_seen += 1
+                    if extracted is None:
+                        await events.put({"event": "page", "page": page_index, "error": error})
                         continue
+                    new_words = [word for word in words if word not in assigned and extracted["sentences"].get(word)]
+                    await events.put({
+                        "event": "page",
+                        "page": page_index,
+                        "ocr_tier": extracted["ocr_tier"],
+                        "ocr_cache_hit": extracted["ocr_cache_hit"],
+                        "words": new_words
+                    })
+                    for word in new_words:
+                        assigned.add(word)
+                        await start_card(page_index, word, best_sentence(extracted["sentences"][word]))
+
+                if document_error:
+                    # Words may be on the pages that were not read, so none get a card without context
+                    await events.put({"event": "error", **document_error})
+                else:
+                    for word in words:
+                        if word not in assigned:
+                            await start_card(None, word, None)
+                await asyncio.gather(*card_tasks)
+                await events.put({
+                    "event": "summary",
+                    "pages": pages_seen,
+                    "total": len(card_tasks),
+                    "created": len(card_tasks) - len(failures),
+                    "failures": sorted(failures, key=lambda failure: failure["index"])
+                })
             except Exception as e:
-                print(f"Error creating card for word '{word}': {str(e)}")
-                continue
-                
-        return cards
+                await events.put({"event": "error", "error": str(e)})
+            finally:
+                await events.put(done)
+
+        stages = [asyncio.create_task(ocr_stage()), asyncio.create_task(generation_stage())]
+        try:
+            while (event := await events.get()) is not done:
+                yield event
+        finally:
+            # Stop outstanding OCR and generations when the client goes away
+            for task in stages + card_tasks:
+                task.cancel()
+
+    # Generate one card, returning (card, None) or (None, error message)
+    async def _generate_card_or_error(
+        self,
+        word: str,
+        context_sentence: Optional[str],
+        n_language: str,
+        l_language: str
+    ) -> Tuple[Optional[Card], Optional[str]]:
+        try:
+            card_details = await self.gemini_service.generate_card(
+                word=word,
+                n_language=n_language,
+                l_language=l_language,
+                sentence=context_sentence
+            )
+        except Exception as e:
+            return None, str(e)
+        # generate_card reports failures as a card with t_word "Error"
+        if card_details.t_word == "Error":
+            return None, card_details.description
+        return self._to_card(card_details), None
+
+    @staticmethod
+    def _find_sentences(text: str, words: List[str]) -> Dict[str, List[str]]:
+        with stage("sentence_extraction"):
+            return get_sentences_for_words(text, words)
+
+    # Number of cards create_cards_from_sentences will try to generate
+    @classmethod
+    def count_cards(cls, words: List[str], sentences: Dict[str, List[str]]) -> int:
+        return len(cls._build_jobs(words, sentences))
+
+    # One job per (word, sentence) pair, or (word, None) when no sentence was found
+    @staticmethod
+    def _build_jobs(words: List[str], sentences: Dict[str, List[str]]) -> List[Tuple[str, Optional[str]]]:
+        jobs = []
+        for word in words:
+            # If no sentences found, create card with None
+            for context_sentence in sentences.get(word) or [None]:
+                jobs.append((word, context_sentence))
+        return jobs
+
+    @staticmethod
+    def _to_card(card_details: Card) -> Card:
+        return Card(
+            word=card_details.word,
+            t_word=card_details.t_word,
+            description=card_details.description,
+            synonyms=card_details.synonyms,
+            sentence=card_details.sentence,
+            t_sentence=card_details.t_sentence,
+            pronunciation=card_details.pronunciation,
+            part_of_speech=card_details.part_of_speech,
+            from_lexicon=card_details.from_lexicon,
+        )
 
     async def process_image_and_extract_sentences(
         self, 
@@ -154,31 +474,52 @@ class CreateCardService:
         if not image_content:
             raise ValueError("Empty image content")
         
-        if len(image_content) > 10 * 1024 * 1024: 
+        if len(image_content) > MAX_IMAGE_SIZE:
             raise ValueError("Image too large")
         
         try:
-            # Bytes → NumPy array 
-            nparr = np.frombuffer(image_content, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if img is None:
-                raise ValueError("Invalid image format")
-            
-            # OCR processing
-            extracted_text = image_to_text(img)
+            # Repeated uploads of the same page are served from the OCR cache
+            ocr_cache = get_ocr_cache()
+            with stage("ocr_cache_lookup"):
+                ocr_result, content_hash, perceptual_hash = await asyncio.to_thread(ocr_cache.lookup, image_content)
+            cache_hit = ocr_result is not None
+
+            if not cache_hit:
+                # Decoding and OCR run in the OCR process pool, off the event loop
+                ocr_result = await get_ocr_executor().submit(image_content, words)
+                # Early-stopped tiled results only hold part of the page and are not cached
+                if ocr_result.get("complete", True):
+                    ocr_cache.put(content_hash, perceptual_hash, {"text": ocr_result["text"], "tier": ocr_result["tier"]})
+            extracted_text = ocr_result["text"]
+
+            # With tiled OCR only the blocks that mention a requested word are searched
+            search_text = extracted_text
+            if ocr_result.get("blocks"):
+                with stage("sentence_extraction"):
+                    search_text = "\n\n".join(select_blocks_with_words(ocr_result["blocks"], words))
             
             # Find sentences for each word
-            results = {}
-            for word in words:
-                sentences = get_sentence_with_word_regex(extracted_text, word.lower())
-                if sentences:
-                    results[word] = sentences
+            results = self._find_sentences(search_text, words)
             
             return {
                 "text": extracted_text,
-                "sentences": results
+                "sentences": results,
+                "ocr_tier": ocr_result["tier"],
+                "ocr_cache_hit": cache_hit
             }
             
+        except OCRQueueFullError:
+            raise
         except Exception as e:
-            raise Exception(f"OCR processing error: {str(e)}")
\ No newline at end of file
+            raise Exception(f"OCR processing error: {str(e)}")
+
+    # process_image_and_extract_sentences for background work, waiting for the OCR pool
+    # instead of failing when it is full
+    async def extract_sentences_when_ready(self, image_content: bytes, words: List[str]) -> Dict[str, any]:
+        for attempt in range(MAX_OCR_ATTEMPTS):
+            try:
+                return await self.process_image_and_extract_sentences(image_content, words)
+            except OCRQueueFullError as e:
+                if attempt + 1 == MAX_OCR_ATTEMPTS:
+                    raise
+                await asyncio.sleep(e.retry_after)
\ No newline at end of file
@@ -1,85 +1,407 @@
-import google.generativeai as genai
 from app.config.settings import get_settings
 from app.models.card import Card
-import json
+from app.monitoring.metrics import observe_tokens, stage
+from app.services.card_cache import get_card_cache
+from app.services.chat_history import ChatHistoryManager, history_tokens
+from app.services.lexicon import LEXICON_FIELDS, get_lexicon
+from app.services.llm_backend import LLMBackend, create_llm_backend
+from app.services.rate_limiter import LANE_BULK, LANE_INTERACTIVE, get_outbound_scheduler
+from app.services.session_store import get_session_store
+from pydantic import TypeAdapter, ValidationError
 import asyncio
+import threading
 import uuid
 from datetime import datetime, timedelta
-import threading
-settings = get_settings()
-GLOBAL_CHAT_SESSIONS = {}
-SESSION_TIMEOUT = 300  
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, get_args
+MAX_BATCH_ATTEMPTS = 2
+# Bump whenever the card prompts change so cached cards from the old prompts are dropped
+CARD_PROMPT_VERSION = "2"
 import time
 
+# Card fields the model fills in, card_id and created_at are set by the app
+CARD_OUTPUT_FIELDS = ("word", "t_word", "synonyms", "description", "sentence", "t_sentence", "pronunciation", "part_of_speech")
+
+# Fields still asked from the model when the lexicon knows the word
+CONTEXT_OUTPUT_FIELDS = ("description", "sentence", "t_sentence")
+
+# Sent as field descriptions in the response schema instead of a field list in the prompt
+CARD_FIELD_HINTS = {
+    "word": "the original word",
+    "t_word": "translation in the native language",
+    "synonyms": "synonyms in the learned language, comma separated",
+    "description": "in the native language: general meaning and the meaning in the sentence",
+    "sentence": "the corrected sentence containing the word, null without context",
+    "t_sentence": "the sentence translated to the native language, null without context",
+    "pronunciation": "phonetic pronunciation",
+    "part_of_speech": "noun, verb, etc.",
+}
+
+
+# Gemini response schema (OpenAPI subset, upper case types) for the given Card fields
+# With indexed=True it describes the batch response: an array of cards with their item index.
+def card_response_schema(indexed: bool = False, fields: Tuple[str, ...] = CARD_OUTPUT_FIELDS) -> Dict:
+    properties = {}
+    for name in fields:
+        annotation = Card.model_fields[name].annotation
+        properties[name] = {"type": "STRING", "description": CARD_FIELD_HINTS[name]}
+        if type(None) in get_args(annotation):
+            properties[name]["nullable"] = True
+    card_schema = {"type": "OBJECT", "properties": properties, "required": list(fields)}
+    if not indexed:
+        return card_schema
+    card_schema["properties"] = {"index": {"type": "INTEGER", "description": "number of the word in the list"}, **properties}
+    card_schema["required"] = ["index", *fields]
+    return {"type": "ARRAY", "items": card_schema}
+
+
+# Structured output: the model is constrained to the schema and returns bare JSON
+CARD_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": card_response_schema()}
+CARD_BATCH_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": card_response_schema(indexed=True)}
+CONTEXT_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": card_response_schema(fields=CONTEXT_OUTPUT_FIELDS),
+}
+CONTEXT_BATCH_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": card_response_schema(indexed=True, fields=CONTEXT_OUTPUT_FIELDS),
+}
+
+# Built once, validating JSON straight into the models skips json.loads and a second pass
+_CARD_ADAPTER = TypeAdapter(Card)
+_CARD_BATCH_ADAPTER = TypeAdapter(List[Dict[str, Any]])
+_CONTEXT_ADAPTER = TypeAdapter(Dict[str, Optional[str]])
+
+# Convert a ChatSession history into JSON-serializable messages accepted by start_chat
+def serialize_history(history) -> List[Dict]:
+    return [
+        {"role": content.role, "parts": [part.text for part in content.parts if part.text]}
+        for content in history
+    ]
+
+# One instance is created for the lifetime of the app (see app.main.lifespan) and shared by
+# every request, so the API client and its connections are reused. The LLM backend is
+# created when the model is first used, not when the service is created.
 class GeminiService:
     def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.generation_model = genai.GenerativeModel(model_name="gemini-2.0-flash") 
-        self.chat_sessions = GLOBAL_CHAT_SESSIONS
-        
-        self._start_cleanup_thread()
-    
-    # Start a background thread to clean up old sessions
-    # This will run every minute to remove sessions that have been inactive for too long
-    def _start_cleanup_thread(self):
-        def cleanup_old_sessions():
-            while True:
-                current_time = time.time()
-                sessions_to_remove = []
-                
-                for session_id, session_data in GLOBAL_CHAT_SESSIONS.items():
-                    if current_time - session_data['timestamp'] > SESSION_TIMEOUT:
-                        sessions_to_remove.append(session_id)
-                
-                for session_id in sessions_to_remove:
-                    del GLOBAL_CHAT_SESSIONS[session_id]
-                    print(f"Session expired and removed: {session_id}")
-                
-                if sessions_to_remove:
-                    print(f"Cleaned up {len(sessions_to_remove)} expired sessions. Active sessions: {len(GLOBAL_CHAT_SESSIONS)}")
-                
-                time.sleep(60)  
-        
-        cleanup_thread = threading.Thread(target=cleanup_old_sessions, daemon=True)
-        cleanup_thread.start()
+        self.settings = settings = get_settings()
+        self._llm_backend = None
+        self._backend_lock = threading.Lock()
+        self.session_store = get_session_store()
+        self.card_cache = get_card_cache(CARD_PROMPT_VERSION)
+        # Context-free card fields of known words, None when disabled
+        self.lexicon = get_lexicon() if settings.LEXICON_ENABLED else None
+        # Every Gemini call goes through the scheduler: rate limit, adaptive concurrency and retries
+        self.scheduler = get_outbound_scheduler()
+        # Reduced batch size for generate_cards, None while batches of the full size parse cleanly.
+        # Halved when a batch comes back with unparseable elements, grown by one after a clean
+        # batch until it reaches the batch size the caller asked for.
+        self._batch_size: Optional[int] = None
+        # Card generation calls, cards requested, tokens, cards whose response failed to parse
+        # and cards served from the lexicon without a call
+        self._card_stats = {"calls": 0, "cards": 0, "prompt_tokens": 0, "output_tokens": 0, "parse_failures": 0, "lexicon_cards": 0}
+        # Bounded chat history, None when every turn resends the full history
+        self.history_manager = None
+        if settings.CHAT_HISTORY_MODE == "bounded":
+            self.history_manager = ChatHistoryManager(settings.CHAT_TOKEN_BUDGET, settings.CHAT_HISTORY_WINDOW)
+        # Sessions being compacted in the background and the tasks doing it
+        self._compacting = set()
+        self._background_tasks = set()
+
+    # Language model backend (see app.services.llm_backend), created on first use
+    # With the Gemini backend this raises ValueError without an API key, which only fails the
+    # calls that need the model.
+    @property
+    def llm_backend(self) -> LLMBackend:
+        if self._llm_backend is None:
+            with self._backend_lock:
+                if self._llm_backend is None:
+                    self._llm_backend = create_llm_backend(self.settings)
+        return self._llm_backend
+
+    # Load the backend (for Gemini, the client library) off the event loop and open the API
+    # connection before the first request arrives. A missing API key is raised, a failed
+    # connection only logged.
+    async def warm_up(self):
+        backend = await asyncio.to_thread(lambda: self.llm_backend)
+        try:
+            await backend.warm_up()
+        except Exception as e:
+            print(f"LLM backend warm-up failed: {str(e)}")
+
+    # Backend name and call counters, None before the backend is loaded
+    def backend_stats(self) -> Optional[Dict]:
+        return self._llm_backend.stats() if self._llm_backend is not None else None
+
+    # Background maintenance, run as a single task for the lifetime of the app
+    # Every interval seconds this removes sessions that have been inactive for too long.
+    async def run_maintenance(self, interval: float = 60):
+        while True:
+            removed = await asyncio.to_thread(self.session_store.purge_expired)
+            if removed:
+                print(f"Cleaned up {removed} expired sessions. Active sessions: {await asyncio.to_thread(self.session_store.active_sessions)}")
+            await asyncio.sleep(interval)
+
+    def close(self):
+        for task in self._background_tasks:
+            task.cancel()
+        self.session_store.close()
+        self.card_cache.close()
+        if self.lexicon is not None:
+            self.lexicon.close()
     
     # Generate a language card for a given word and context sentence
+    # When the lexicon knows the word only the context-dependent fields are generated, and a
+    # context-free card whose general description is known is served without a Gemini call.
     async def generate_card(self, word: str, n_language: str, l_language: str = "English", sentence: str = None) -> Card:
-        
-        prompt = f"""Create a language card for the word '{word}', user native language is '{n_language}' and learning '{l_language}'. 
-        {f'in the context: {sentence}' if sentence else ''}.Correct the misspelled parts in the sentence and create the card based on it.
-        
-        Return a JSON response with these fields:
-        - word (original word)
-        - t_word (translation of the word)
-        - synonyms (original synonyms, comma separated)
-        - description (Explain in the user's native language. Show the general meaning of the given word and the meaning it creates in the sentence.)
-        - sentence (Sentence provided by user, If a long fragment appears, return only the sentence containing the word.)
-        - t_sentence (translated sentence in the user's native language)
-        - pronunciation (phonetic pronunciation)
-        - part_of_speech (word is it a noun, verb, etc.)
-
-        Response must be valid JSON format. Only return the JSON object, no extra text or markdown.
-        """
+
+        cached_card = await self.card_cache.get(word, sentence, n_language, l_language)
+        if cached_card is not None:
+            return cached_card
+
+        entry = await self._lexicon_entry(word, n_language, l_language)
+        if entry is not None and not sentence and entry["description"]:
+            self._card_stats["lexicon_cards"] += 1
+            return Card(word=word, **entry, from_lexicon=True)
+
+        context = sentence if sentence else "none"
+        if entry is not None:
+            prompt = (
+                f"Explain the word '{word}' ({entry['part_of_speech'] or 'word'}, '{entry['t_word']}'). "
+                f"Native language: {n_language}. Learning: {l_language}.\n"
+                f"Context: {context}\n"
+                "Correct misspellings in the context."
+            )
+            generation_config, name = CONTEXT_GENERATION_CONFIG, "gemini_card_context"
+        else:
+            prompt = (
+                f"Language card for the word '{word}'. Native language: {n_language}. Learning: {l_language}.\n"
+                f"Context: {context}\n"
+                "Correct misspellings in the context and base the card on it."
+            )
+            generation_config, name = CARD_GENERATION_CONFIG, "gemini_card"
         try:
-            response = await self.generation_model.generate_content_async(contents=[prompt])
-            raw_response_text = response.text.strip()
-            
-            if raw_response_text.startswith('```json') and raw_response_text.endswith('```'):
-                json_str = raw_response_text[len('```json'):-len('```')].strip()
-            else:
-                json_str = raw_response_text.strip()
-            
-            parsed_data = json.loads(json_str)
-            return Card(**parsed_data)
+            response = await self.scheduler.run(
+                lambda: self.llm_backend.generate_content_async(
+                    contents=[prompt], generation_config=generation_config
+                ),
+                LANE_BULK,
+                name=name
+            )
+            self._record_card_usage(response, 1)
+
+            try:
+                with stage("json_parse"):
+                    if entry is not None:
+                        context_fields = _CONTEXT_ADAPTER.validate_json(response.text)
+                        card = self._card_from_entry(word, entry, context_fields)
+                    else:
+                        card = _CARD_ADAPTER.validate_json(response.text)
+            except ValidationError:
+                self._card_stats["parse_failures"] += 1
+                raise
+            await self.card_cache.put(card, word, sentence, n_language, l_language)
+            # A card generated without context also brings the general description
+            if self.lexicon is not None and (entry is None or not sentence):
+                await self.lexicon.learn(word, card, n_language, l_language, general=not sentence)
+            return card
         except Exception as e:
             print(f"Error generating card: {e}")
             return Card(word=word, t_word="Error", description=str(e))
 
-    # Analyze a sentence using a specific word and provide feedback
-    async def sentence_response(self, word: str, sentence: str, n_language: str = "Turkish", l_language: str = "English", session_id: str = None) -> str:
-      
-        prompt = f"""
+    # Generate language cards for many (word, sentence) pairs using one Gemini call per batch
+    # Returns cards in the same order as items. Cached cards are served without a call, and so
+    # are context-free cards of words the lexicon fully knows. Words the lexicon knows are
+    # batched separately and only get their context-dependent fields generated.
+    # Elements that fail to parse are re-issued
+    # in a later batch, and anything still missing falls back to generate_card. A batch whose
+    # call fails (network, quota or deadline errors, after the scheduler's retries) gets error
+    # cards instead, so an outage is not multiplied into smaller batches and single calls.
+    # batch_size is the largest batch sent (CARD_BATCH_SIZE by default), the adaptive size
+    # stays below it.
+    async def generate_cards(
+        self,
+        items: List[Tuple[str, Optional[str]]],
+        n_language: str,
+        l_language: str = "English",
+        concurrency: int = 1,
+        batch_size: Optional[int] = None
+    ) -> List[Card]:
+
+        batch_limit = max(1, batch_size or self.settings.CARD_BATCH_SIZE)
+
+        results: List[Optional[Card]] = await self.card_cache.get_many(items, n_language, l_language)
+        pending = [i for i, card in enumerate(results) if card is None]
+        entries: Dict[int, Dict] = {}
+        if self.lexicon is not None and pending:
+            found = await self.lexicon.lookup_many([items[i][0] for i in pending], n_language, l_language)
+        else:
+            found = [None] * len(pending)
+        for i, entry in zip(pending, found):
+            word, sentence = items[i]
+            if entry is None:
+                continue
+            if not sentence and entry["description"]:
+                self._card_stats["lexicon_cards"] += 1
+                results[i] = Card(word=word, **entry, from_lexicon=True)
+            else:
+                entries[i] = entry
+        pending = [i for i in pending if results[i] is None]
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run_batch(indices: List[int]):
+            batch_entries = [entries[i] for i in indices] if indices[0] in entries else None
+            try:
+                async with semaphore:
+                    parsed = await self._generate_card_batch(
+                        [items[i] for i in indices], n_language, l_language, batch_entries
+                    )
+            except Exception as e:
+                print(f"Error generating card batch: {e}")
+                for index in indices:
+                    results[index] = Card(word=items[index][0], t_word="Error", description=str(e))
+                return
+            generated = []
+            for index, card in zip(indices, parsed):
+                if card is not None:
+                    results[index] = card
+                    generated.append((card, *items[index]))
+            self._adjust_batch_size(all(card is not None for card in parsed), batch_limit)
+            await self.card_cache.put_many(generated, n_language, l_language)
+
+        for _ in range(MAX_BATCH_ATTEMPTS):
+            if not pending:
+                break
+            batch_size = min(self._batch_size or batch_limit, batch_limit)
+            batches = []
+            for group in ([i for i in pending if i in entries], [i for i in pending if i not in entries]):
+                batches.extend(group[i:i + batch_size] for i in range(0, len(group), batch_size))
+            await asyncio.gather(*(run_batch(batch) for batch in batches))
+            pending = [i for i in pending if results[i] is None]
+
+        async def run_single(index: int):
+            word, sentence = items[index]
+            async with semaphore:
+                results[index] = await self.generate_card(
+                    word=word, n_language=n_language, l_language=l_language, sentence=sentence
+                )
+
+        await asyncio.gather(*(run_single(i) for i in pending))
+        return results
+
+    # Ask Gemini for a JSON array of cards, one element per item
+    # With entries (the lexicon entries of every item) only the context-dependent fields are
+    # requested and merged with the entries. Returns a list aligned with items, with None for
+    # elements that were missing or invalid. Errors of the call itself are raised.
+    async def _generate_card_batch(
+        self,
+        items: List[Tuple[str, Optional[str]]],
+        n_language: str,
+        l_language: str,
+        entries: Optional[List[Dict]] = None
+    ) -> List[Optional[Card]]:
+
+        if entries is not None:
+            numbered_items = "\n".join(
+                f"{index}. word: '{word}' ('{entry['t_word']}') | context: {sentence or 'none'}"
+                for index, ((word, sentence), entry) in enumerate(zip(items, entries))
+            )
+            prompt = (
+                f"Explain the words below. Native language: {n_language}. Learning: {l_language}.\n"
+                "When a context is given, correct misspellings in it.\n\n"
+                f"{numbered_items}"
+            )
+            generation_config, name = CONTEXT_BATCH_GENERATION_CONFIG, "gemini_card_context_batch"
+        else:
+            numbered_items = "\n".join(
+                f"{index}. word: '{word}' | context: {sentence or 'none'}"
+                for index, (word, sentence) in enumerate(items)
+            )
+            prompt = (
+                f"Language cards for the words below. Native language: {n_language}. Learning: {l_language}.\n"
+                "When a context is given, correct misspellings in it and base the card on it.\n\n"
+                f"{numbered_items}"
+            )
+            generation_config, name = CARD_BATCH_GENERATION_CONFIG, "gemini_card_batch"
+        cards: List[Optional[Card]] = [None] * len(items)
+        try:
+            response = await self.scheduler.run(
+                lambda: self.llm_backend.generate_content_async(
+                    contents=[prompt], generation_config=generation_config
+                ),
+                LANE_BULK,
+                name=name
+            )
+            self._record_card_usage(response, len(items))
+            with stage("json_parse"):
+                parsed_data = _CARD_BATCH_ADAPTER.validate_json(response.text)
+        except ValidationError as e:
+            print(f"Error parsing card batch: {e}")
+            self._card_stats["parse_failures"] += len(items)
+            return cards
+
+        learned = []
+        for element in parsed_data:
+            try:
+                index = int(element.pop("index"))
+                if 0 <= index < len(items) and cards[index] is None:
+                    if entries is not None:
+                        cards[index] = self._card_from_entry(items[index][0], entries[index], element)
+                    else:
+                        cards[index] = _CARD_ADAPTER.validate_python(element)
+                    if entries is None or not items[index][1]:
+                        learned.append((items[index][0], cards[index], not items[index][1]))
+            except Exception as e:
+                print(f"Error parsing card batch element: {e}")
+        if self.lexicon is not None and learned:
+            await self.lexicon.learn_many(learned, n_language, l_language)
+        self._card_stats["parse_failures"] += sum(card is None for card in cards)
+        return cards
+
+    async def _lexicon_entry(self, word: str, n_language: str, l_language: str) -> Optional[Dict]:
+        if self.lexicon is None:
+            return None
+        return await self.lexicon.lookup(word, n_language, l_language)
+
+    # Card from the lexicon fields of a word plus the generated context-dependent fields
+    @staticmethod
+    def _card_from_entry(word: str, entry: Dict, context_fields: Dict) -> Card:
+        data = {field: entry[field] for field in LEXICON_FIELDS}
+        data.update({field: context_fields.get(field) for field in CONTEXT_OUTPUT_FIELDS})
+        return _CARD_ADAPTER.validate_python({"word": word, **data})
+
+    # Count a card generation call and observe its tokens per requested card
+    def _record_card_usage(self, response, card_count: int):
+        stats = self._card_stats
+        stats["calls"] += 1
+        stats["cards"] += card_count
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        stats["prompt_tokens"] += usage.prompt_token_count
+        stats["output_tokens"] += usage.candidates_token_count
+        observe_tokens("prompt", usage.prompt_token_count / card_count)
+        observe_tokens("output", usage.candidates_token_count / card_count)
+
+    # Card generation totals with tokens per card and the share of cards that failed to parse
+    def card_stats(self) -> Dict:
+        stats = dict(self._card_stats)
+        cards = stats["cards"]
+        stats["prompt_tokens_per_card"] = stats["prompt_tokens"] / cards if cards else 0.0
+        stats["output_tokens_per_card"] = stats["output_tokens"] / cards if cards else 0.0
+        stats["parse_failure_rate"] = stats["parse_failures"] / cards if cards else 0.0
+        return stats
+
+    def _adjust_batch_size(self, success: bool, batch_limit: int):
+        current = min(self._batch_size or batch_limit, batch_limit)
+        if not success:
+            self._batch_size = max(1, current // 2)
+        elif self._batch_size is not None:
+            self._batch_size = current + 1 if current + 1 < batch_limit else None
+
+    # Prompt for the sentence analysis that opens a chat session
+    @staticmethod
+    def _sentence_prompt(word: str, sentence: str, n_language: str, l_language: str) -> str:
+        return f"""
         You are a language teaching assistant. You will analyze the sentence created by the user with a certain word.
         The user's native language is '{n_language}' and they are learning '{l_language}'.
         They used the word '{word}' in the sentence: '{sentence}'.Prepare an answer for the student.
@@ -90,20 +412,20 @@ class GeminiService:
         3.  Provide two alternative example sentences using the word '{word}', showing both the '{l_language}' version and its '{n_language}' translation.
         4.  After your analysis, ask an open-ended question to encourage the user to continue the conversation, for example: "Aklına takılan başka bir şey var mı?".
         """
+
+    # Analyze a sentence using a specific word and provide feedback
+    async def sentence_response(self, word: str, sentence: str, n_language: str = "Turkish", l_language: str = "English", session_id: str = None) -> str:
+      
+        prompt = self._sentence_prompt(word, sentence, n_language, l_language)
         
-        chat = self.generation_model.start_chat(history=[])
+        chat = self.llm_backend.start_chat(history=[])
 
         if session_id is None:
             session_id = str(uuid.uuid4())
 
-        GLOBAL_CHAT_SESSIONS[session_id] = {
-                'chat': chat,
-                'timestamp': time.time()
-            }
-
-        
         try:
-            response = await chat.send_message_async(prompt)
+            response = await self.scheduler.run(lambda: chat.send_message_async(prompt), LANE_INTERACTIVE, name="gemini_chat")
+            await self._save_session(session_id, {'created_at': time.time()}, chat, response)
             return {
                 "data": response.text,
                 "session_id": session_id
@@ -114,20 +436,131 @@ class GeminiService:
     # Start a chat session with sentence analysis
     async def continue_chat(self, session_id: str, user_message: str) -> str:
         print(f"Looking for session: {session_id}")
-        print(f"Available sessions: {list(GLOBAL_CHAT_SESSIONS.keys())}")
         
-        if session_id not in GLOBAL_CHAT_SESSIONS:
+        session_data = await asyncio.to_thread(self.session_store.get, session_id)
+        if session_data is None:
             return "Session not found or expired. Please start a new chat session."
 
-        session_data = GLOBAL_CHAT_SESSIONS[session_id]
-        chat = session_data['chat']
-        
-        session_data['timestamp'] = time.time()
+        # Sessions hold plain history, so any worker can rebuild the chat
+        chat = self.llm_backend.start_chat(history=session_data['history'])
         
         try:
-            response = await chat.send_message_async(user_message)
+            response = await self.scheduler.run(lambda: chat.send_message_async(user_message), LANE_INTERACTIVE, name="gemini_chat")
+            await self._save_session(session_id, session_data, chat, response)
             return response.text
         except Exception as e:
             return f"Error occurred while continuing the chat: {str(e)}"
 
+    # Streaming variant of sentence_response
+    # Yields {"event": "session"} with the session id first, then {"event": "chunk"} for each
+    # piece of text as the model produces it, and {"event": "done"} once the session is saved.
+    async def sentence_response_stream(self, word: str, sentence: str, n_language: str = "Turkish", l_language: str = "English", session_id: str = None) -> AsyncIterator[Dict]:
+
+        prompt = self._sentence_prompt(word, sentence, n_language, l_language)
+        chat = self.llm_backend.start_chat(history=[])
 
+        if session_id is None:
+            session_id = str(uuid.uuid4())
+
+        yield {"event": "session", "session_id": session_id}
+        try:
+            # Only opening the stream is scheduled (and retried), chunks are read after the slot is returned
+            response = await self.scheduler.run(lambda: chat.send_message_async(prompt, stream=True), LANE_INTERACTIVE, name="gemini_chat_stream")
+            async for text in self._stream_text(response):
+                yield {"event": "chunk", "text": text}
+            # The history is only complete once the stream has been fully consumed
+            await self._save_session(session_id, {'created_at': time.time()}, chat, response)
+            yield {"event": "done", "session_id": session_id}
+        except Exception as e:
+            yield {"event": "error", "message": f"Error providing sentence response: {str(e)}"}
+
+    # Streaming variant of continue_chat, with the same events as sentence_response_stream
+    async def continue_chat_stream(self, session_id: str, user_message: str) -> AsyncIterator[Dict]:
+        session_data = await asyncio.to_thread(self.session_store.get, session_id)
+        if session_data is None:
+            yield {"event": "error", "message": "Session not found or expired. Please start a new chat session."}
+            return
+
+        chat = self.llm_backend.start_chat(history=session_data['history'])
+        yield {"event": "session", "session_id": session_id}
+        try:
+            response = await self.scheduler.run(lambda: chat.send_message_async(user_message, stream=True), LANE_INTERACTIVE, name="gemini_chat_stream")
+            async for text in self._stream_text(response):
+                yield {"event": "chunk", "text": text}
+            await self._save_session(session_id, session_data, chat, response)
+            yield {"event": "done", "session_id": session_id}
+        except Exception as e:
+            yield {"event": "error", "message": f"Error occurred while continuing the chat: {str(e)}"}
+
+    # Yield the text of each chunk of a streamed response
+    async def _stream_text(self, response) -> AsyncIterator[str]:
+        async for chunk in response:
+            text = "".join(part.text for part in chunk.parts if part.text)
+            if text:
+                yield text
+
+    # Token usage of a chat session, or None when it does not exist
+    # token_count is the estimated size of the stored history, prompt_tokens is what the
+    # API reported for the last turn (history plus the new message).
+    async def get_session_info(self, session_id: str) -> Optional[Dict]:
+        session_data = await asyncio.to_thread(self.session_store.get, session_id)
+        if session_data is None:
+            return None
+        return {
+            "session_id": session_id,
+            "messages": len(session_data['history']),
+            "token_count": session_data.get('token_count', history_tokens(session_data['history'])),
+            "prompt_tokens": session_data.get('prompt_tokens'),
+            "turns": session_data.get('turns', 0),
+            "compactions": session_data.get('compactions', 0),
+            "token_budget": self.history_manager.token_budget if self.history_manager else None,
+        }
+
+    # Store the session after a turn and compact its history in the background when needed
+    async def _save_session(self, session_id: str, session_data: Dict, chat, response):
+        history = serialize_history(chat.history)
+        usage = getattr(response, "usage_metadata", None)
+        session_data['history'] = history
+        session_data['token_count'] = history_tokens(history)
+        session_data['prompt_tokens'] = usage.prompt_token_count if usage else None
+        session_data['turns'] = session_data.get('turns', 0) + 1
+        await asyncio.to_thread(self.session_store.put, session_id, session_data)
+
+        if (self.history_manager is not None and session_id not in self._compacting
+                and self.history_manager.needs_compaction(history)):
+            self._compacting.add(session_id)
+            task = asyncio.create_task(self._compact_session(session_id, history))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+    # Summarize older turns off the request path, so the turn that crossed the budget is not delayed
+    async def _compact_session(self, session_id: str, history: List[Dict]):
+        try:
+            compacted = await self.history_manager.compact(history, self._summarize_turns)
+            session_data = await asyncio.to_thread(self.session_store.get, session_id)
+            if session_data is None:
+                return
+            # Keep any turns that finished while the summary was being generated
+            current = session_data['history']
+            if current[:len(history)] != history:
+                return
+            session_data['history'] = compacted + current[len(history):]
+            session_data['token_count'] = history_tokens(session_data['history'])
+            session_data['compactions'] = session_data.get('compactions', 0) + 1
+            await asyncio.to_thread(self.session_store.put, session_id, session_data)
+        except Exception as e:
+            print(f"Chat history compaction failed: {str(e)}")
+        finally:
+            self._compacting.discard(session_id)
+
+    async def _summarize_turns(self, transcript: str) -> str:
+        prompt = f"""Summarize this part of a language tutoring conversation so the tutor can continue it.
+        Keep the words, corrections and explanations that were discussed and any open questions of the student.
+        Write the summary in the language the conversation uses, in at most 150 words.
+
+        {transcript}
+        """
+        response = await self.scheduler.run(
+            lambda: self.llm_backend.generate_content_async(contents=[prompt]), LANE_BULK, name="gemini_summary"
+        )
+        return response.text
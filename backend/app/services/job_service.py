@@ -0,0 +1,308 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+from app.services.create_card_service import CreateCardService, validate_text_request, validate_words
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Raised when the job queue is full, retry_after is a hint in seconds for the client
+class JobQueueFullError(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Card job queue is full, please retry later")
+        self.retry_after = retry_after
+
+
+# Card jobs and their partial results kept in a SQLite file
+# The payload (upload bytes or text) is stored with the job so queued work survives a restart,
+# and cards are stored one row each so progress updates do not rewrite earlier cards.
+class JobStore:
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                stage TEXT,
+                owner INTEGER NOT NULL,
+                params TEXT NOT NULL,
+                payload BLOB,
+                extracted TEXT,
+                total INTEGER,
+                failures TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS job_cards (
+                job_id TEXT NOT NULL,
+                card_index INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, card_index)
+            )"""
+        )
+
+    def create(self, job_id: str, params: Dict, payload: bytes):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (job_id, status, owner, params, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, os.getpid(), json.dumps(params, ensure_ascii=False), payload, now, now)
+            )
+
+    # Update the given columns of a job (status, stage, owner, extracted, total, failures, error)
+    def update(self, job_id: str, **fields):
+        for key in ("extracted", "failures"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key], ensure_ascii=False)
+        fields["updated_at"] = time.time()
+        if fields.get("status") in (COMPLETED, FAILED):
+            # The input is not needed any more once the job has finished
+            fields["payload"] = None
+        columns = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def add_card(self, job_id: str, index: int, card: Dict):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO job_cards (job_id, card_index, data) VALUES (?, ?, ?)",
+                (job_id, index, json.dumps(card, ensure_ascii=False))
+            )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, stage, params, extracted, total, failures, error, created_at, updated_at "
+                "FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            cards = self._db.execute(
+                "SELECT card_index, data FROM job_cards WHERE job_id = ? ORDER BY card_index", (job_id,)
+            ).fetchall()
+
+        status, stage, params, extracted, total, failures, error, created_at, updated_at = row
+        failures = json.loads(failures) if failures else []
+        return {
+            "job_id": job_id,
+            "status": status,
+            "stage": stage,
+            "params": json.loads(params),
+            "extracted": json.loads(extracted) if extracted else None,
+            "progress": {"total": total, "created": len(cards), "failed": len(failures)},
+            "cards": [{"index": index, "card": json.loads(data)} for index, data in cards],
+            "failures": failures,
+            "error": error,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    # Unfinished jobs whose owning process has exited, oldest first
+    # Jobs of other live workers sharing the file are left to them.
+    def orphaned(self) -> List[tuple]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT job_id, owner, params, payload FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING)
+            ).fetchall()
+        return [(job_id, owner, params, payload) for job_id, owner, params, payload in rows if not _process_alive(owner)]
+
+    # Take over an orphaned job from previous_owner, requeueing it for this process
+    # Returns False when another worker claimed it first, only the process whose update
+    # matched the old owner may run it.
+    def claim(self, job_id: str, previous_owner: int) -> bool:
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET owner = ?, status = ?, stage = NULL, updated_at = ? "
+                "WHERE job_id = ? AND owner = ? AND status IN (?, ?)",
+                (os.getpid(), QUEUED, time.time(), job_id, previous_owner, QUEUED, RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def reset_cards(self, job_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM job_cards WHERE job_id = ?", (job_id,))
+
+    # Remove finished jobs older than ttl seconds, returns how many were removed
+    def purge_finished(self, ttl: float) -> int:
+        cutoff = time.time() - ttl
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM job_cards WHERE job_id IN "
+                "(SELECT job_id FROM jobs WHERE status IN (?, ?) AND updated_at < ?)",
+                (COMPLETED, FAILED, cutoff)
+            )
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (COMPLETED, FAILED, cutoff)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        self._db.close()
+
+
+# Runs card creation in the background so clients poll for results instead of holding a request open
+# Jobs wait in a bounded queue and are processed by a fixed number of worker tasks, each job
+# going through the stages "ocr" (images) or "extract" (text), then "generate". Cards are
+# stored as soon as they are generated, so polling clients see partial results.
+# Store calls made while serving run in a thread, SQLite writes (and upload payloads of
+# several MB) would otherwise block the event loop.
+class JobService:
+    def __init__(
+        self,
+        create_card_service: CreateCardService,
+        store: JobStore,
+        workers: int = 2,
+        max_queue: int = 32,
+        retry_after: int = 10,
+        ttl: float = 24 * 3600
+    ):
+        self.create_card_service = create_card_service
+        self.store = store
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.ttl = ttl
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    # Start the workers and resume jobs left unfinished by a previous run
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self.store.purge_finished(self.ttl)
+        for job_id, owner, params, payload in self.store.orphaned():
+            # Every worker sharing the file looks for orphans at startup, the claim decides which one resumes the job
+            if not self.store.claim(job_id, owner):
+                continue
+            try:
+                self._queue.put_nowait((job_id, json.loads(params), payload))
+            except asyncio.QueueFull:
+                self.store.update(job_id, status=FAILED, error="Job could not be resumed after a restart")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Card job service started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # The submit methods raise ValueError for requests the synchronous endpoints reject, before queueing
+    async def submit_image(self, image_content: bytes, words: List[str], n_language: str, l_language: str) -> str:
+        validate_words(words)
+        return await self._submit("image", image_content, words, n_language, l_language)
+
+    async def submit_text(self, text: str, words: List[str], n_language: str, l_language: str) -> str:
+        validate_text_request(text, words)
+        return await self._submit("text", text.encode("utf-8"), words, n_language, l_language)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    async def _submit(self, kind: str, payload: bytes, words: List[str], n_language: str, l_language: str) -> str:
+        if self._queue is None:
+            self.start()
+        if self._queue.full():
+            self.rejected += 1
+            raise JobQueueFullError(self.retry_after)
+
+        job_id = str(uuid.uuid4())
+        params = {"kind": kind, "words": words, "n_language": n_language, "l_language": l_language}
+        await asyncio.to_thread(self.store.create, job_id, params, payload)
+        try:
+            self._queue.put_nowait((job_id, params, payload))
+        except asyncio.QueueFull:
+            # Other submissions filled the queue while the job was being stored
+            self.rejected += 1
+            await asyncio.to_thread(self.store.update, job_id, status=FAILED, error="Card job queue is full")
+            raise JobQueueFullError(self.retry_after)
+        return job_id
+
+    async def _worker(self):
+        while True:
+            job_id, params, payload = await self._queue.get()
+            try:
+                await self._run(job_id, params, payload)
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Card job {job_id} failed: {str(e)}")
+                await asyncio.to_thread(self.store.update, job_id, status=FAILED, error=str(e))
+                self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, params: Dict, payload: bytes):
+        service = self.create_card_service
+        words = params["words"]
+        store = self.store
+        await asyncio.to_thread(store.reset_cards, job_id)
+
+        if params["kind"] == "image":
+            await asyncio.to_thread(store.update, job_id, status=RUNNING, stage="ocr")
+            extracted = await service.extract_sentences_when_ready(payload, words)
+        else:
+            await asyncio.to_thread(store.update, job_id, status=RUNNING, stage="extract")
+            extracted = service.extract_sentences_from_text(payload.decode("utf-8"), words)
+
+        total = service.count_cards(words, extracted["sentences"])
+        await asyncio.to_thread(store.update, job_id, stage="generate", extracted=extracted, total=total)
+        events = service.stream_cards_from_sentences(
+            words=words,
+            sentences=extracted["sentences"],
+            n_language=params["n_language"],
+            l_language=params["l_language"]
+        )
+        async for event in events:
+            if event["event"] == "card":
+                await asyncio.to_thread(store.add_card, job_id, event["index"], event["card"])
+            else:
+                await asyncio.to_thread(store.update, job_id, status=COMPLETED, stage=None, failures=event["failures"])
@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.config.settings import get_settings
+from app.models.card import Card
+from app.services.card_cache import normalize_text
+
+# Card fields that do not depend on the context sentence
+LEXICON_FIELDS = ("t_word", "pronunciation", "part_of_speech", "synonyms")
+
+# General meaning of the word, only stored from cards generated without a context sentence
+# or from imported word lists. With it a context-free card needs no Gemini call at all.
+DESCRIPTION_FIELD = "description"
+
+# Where an entry came from, imported entries take precedence over generated ones
+SOURCE_GENERATED = "generated"
+SOURCE_IMPORT = "import"
+
+
+# Word -> context-free card fields for one language pair, in a SQLite file
+# Reads go through SQLite's memory-mapped I/O, so a lookup by word is a B-tree walk over
+# mapped pages without a read() call. Generated cards only fill fields that are still empty,
+# imports overwrite them.
+class LexiconStore:
+    def __init__(self, db_path: str, mmap_size: int = 256 * 1024 * 1024):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                word TEXT PRIMARY KEY,
+                t_word TEXT,
+                pronunciation TEXT,
+                part_of_speech TEXT,
+                synonyms TEXT,
+                description TEXT,
+                source TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID"""
+        )
+
+    def get(self, word: str) -> Optional[Dict[str, Optional[str]]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT t_word, pronunciation, part_of_speech, synonyms, description FROM entries WHERE word = ?",
+                (normalize_text(word),)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(LEXICON_FIELDS + (DESCRIPTION_FIELD,), row))
+
+    # Add or update entries from (word, fields) pairs in one transaction, returns how many were written
+    def put_many(self, entries: Iterable[Tuple[str, Dict[str, Optional[str]]]], source: str = SOURCE_GENERATED) -> int:
+        columns = LEXICON_FIELDS + (DESCRIPTION_FIELD,)
+        if source == SOURCE_IMPORT:
+            updates = ", ".join(f"{column} = COALESCE(excluded.{column}, {column})" for column in columns)
+            updates += ", source = excluded.source"
+        else:
+            updates = ", ".join(f"{column} = COALESCE({column}, excluded.{column})" for column in columns)
+        statement = (
+            f"INSERT INTO entries (word, {', '.join(columns)}, source, updated_at) "
+            f"VALUES (?, {', '.join('?' for _ in columns)}, ?, ?) "
+            f"ON CONFLICT(word) DO UPDATE SET {updates}, updated_at = excluded.updated_at"
+        )
+        now = time.time()
+        rows = [
+            (normalize_text(word), *(fields.get(column) or None for column in columns), source, now)
+            for word, fields in entries
+            if normalize_text(word)
+        ]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(statement, rows)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# One LexiconStore file per (native language, learned language) pair, opened on first use
+class Lexicon:
+    def __init__(self, directory: str, mmap_size: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.mmap_size = mmap_size
+        self._stores: Dict[Tuple[str, str], LexiconStore] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.learned = 0
+
+    def store(self, n_language: str, l_language: str) -> LexiconStore:
+        key = (normalize_text(n_language), normalize_text(l_language))
+        store = self._stores.get(key)
+        if store is None:
+            with self._lock:
+                store = self._stores.get(key)
+                if store is None:
+                    store = LexiconStore(os.path.join(self.directory, lexicon_file_name(*key)), self.mmap_size)
+                    self._stores[key] = store
+        return store
+
+    # Context-free fields of a word, or None when the word is unknown or has no translation
+    async def lookup(self, word: str, n_language: str, l_language: str) -> Optional[Dict[str, Optional[str]]]:
+        return (await self.lookup_many([word], n_language, l_language))[0]
+
+    # Context-free fields of many words, read in one worker thread call so SQLite stays off the event loop
+    async def lookup_many(self, words: List[str], n_language: str, l_language: str) -> List[Optional[Dict[str, Optional[str]]]]:
+        entries = await asyncio.to_thread(self._read, words, n_language, l_language)
+        found = []
+        for entry in entries:
+            if entry is None or not entry["t_word"]:
+                self.misses += 1
+                found.append(None)
+            else:
+                self.hits += 1
+                found.append(entry)
+        return found
+
+    # Remember the context-free fields of a card generated for word
+    # The entry is keyed on the word that was looked up, not on card.word, which the model may
+    # return lemmatized or with corrected spelling. general is True when the card was generated
+    # without a context sentence, only then its description is the general meaning of the word.
+    async def learn(self, word: str, card: Card, n_language: str, l_language: str, general: bool = False):
+        await self.learn_many([(word, card, general)], n_language, l_language)
+
+    # learn for many (word, card, general) triples, written in one transaction in a worker thread
+    async def learn_many(self, learned: List[Tuple[str, Card, bool]], n_language: str, l_language: str):
+        entries = []
+        for word, card, general in learned:
+            if not word or not card.t_word or card.t_word == "Error":
+                continue
+            fields = {field: getattr(card, field) for field in LEXICON_FIELDS}
+            if general:
+                fields[DESCRIPTION_FIELD] = card.description
+            entries.append((word, fields))
+        if entries:
+            await asyncio.to_thread(self._write, entries, n_language, l_language)
+            self.learned += len(entries)
+
+    def _read(self, words: List[str], n_language: str, l_language: str) -> List[Optional[Dict[str, Optional[str]]]]:
+        store = self.store(n_language, l_language)
+        return [store.get(word) for word in words]
+
+    def _write(self, entries: List[Tuple[str, Dict[str, Optional[str]]]], n_language: str, l_language: str):
+        self.store(n_language, l_language).put_many(entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "learned": self.learned, "language_pairs": len(self._stores)}
+
+    def close(self):
+        with self._lock:
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
+
+
+def lexicon_file_name(n_language: str, l_language: str) -> str:
+    def slug(language: str) -> str:
+        return re.sub(r"[^a-z0-9]+", "_", normalize_text(language)).strip("_") or "unknown"
+    return f"{slug(l_language)}-{slug(n_language)}.db"
+
+
+@lru_cache()
+def get_lexicon() -> Lexicon:
+    settings = get_settings()
+    return Lexicon(settings.LEXICON_DIR, settings.LEXICON_MMAP_SIZE)
+
+
+# Read word list rows from a CSV file with a header row, or from JSON lines, with a "word"
+# column and any of the lexicon fields
+def read_word_list(path: str) -> Iterable[Tuple[str, Dict[str, Optional[str]]]]:
+    columns = LEXICON_FIELDS + (DESCRIPTION_FIELD,)
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            word = row.get("word")
+            if word:
+                yield word, {column: row.get(column) for column in columns}
+
+
+# Import a word list into the lexicon of a language pair:
+#     python -m app.services.lexicon words.csv --native Turkish --learning English
+def main():
+    parser = argparse.ArgumentParser(description="Import a word list (CSV with header or JSON lines) into the lexicon")
+    parser.add_argument("path")
+    parser.add_argument("--native", required=True, help="native language of the learners, e.g. Turkish")
+    parser.add_argument("--learning", default="English", help="language being learned")
+    parser.add_argument("--batch", type=int, default=10000, help="rows per transaction")
+    args = parser.parse_args()
+
+    store = get_lexicon().store(args.native, args.learning)
+    written, batch = 0, []
+    for entry in read_word_list(args.path):
+        batch.append(entry)
+        if len(batch) >= args.batch:
+            written += store.put_many(batch, SOURCE_IMPORT)
+            batch = []
+    written += store.put_many(batch, SOURCE_IMPORT)
+    print(f"Imported {written} entries, the {args.learning}/{args.native} lexicon holds {len(store)} words")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
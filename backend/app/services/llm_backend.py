@@ -0,0 +1,226 @@
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+from app.services.card_cache import normalize_text
+from app.services.chat_history import estimate_tokens
+
+# Items of a batch card prompt: "0. word: 'run' | context: He runs." (the lexicon variant
+# adds the translation in parentheses after the word)
+_BATCH_ITEM = re.compile(r"^(\d+)\. word: '([^']*)'.*?\| context: (.*)$", re.MULTILINE)
+_SINGLE_WORD = re.compile(r"word '([^']*)'")
+_SINGLE_CONTEXT = re.compile(r"^Context: (.*)$", re.MULTILINE)
+
+FAKE_CHAT_REPLY = (
+    "Your sentence is grammatically correct and the word is used in the right sense. "
+    "Two more examples: 'She decided to {word} early.' and 'They always {word} together.' "
+    "Is there anything else you would like to ask?"
+)
+
+
+# Interface for the language models used by GeminiService
+# Mirrors the part of google.generativeai.GenerativeModel the service relies on: responses have
+# .text and .usage_metadata (prompt_token_count, candidates_token_count), streamed responses are
+# async iterables of chunks with .parts, and chat sessions have .history (contents with .role
+# and .parts) and send_message_async(message, stream=False).
+class LLMBackend:
+    name = "base"
+
+    async def generate_content_async(self, contents: List[str], generation_config: Optional[Dict] = None):
+        raise NotImplementedError
+
+    # Chat session continuing history, messages as produced by serialize_history
+    def start_chat(self, history: Optional[List[Dict]] = None):
+        raise NotImplementedError
+
+    async def warm_up(self):
+        pass
+
+    def stats(self) -> Dict:
+        return {"backend": self.name}
+
+
+# The Gemini API through the google.generativeai client, imported when the backend is created
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str], model_name: str = "gemini-2.0-flash"):
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment or .env file")
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name=model_name)
+
+    async def generate_content_async(self, contents: List[str], generation_config: Optional[Dict] = None):
+        return await self.model.generate_content_async(contents=contents, generation_config=generation_config)
+
+    def start_chat(self, history: Optional[List[Dict]] = None):
+        return self.model.start_chat(history=history or [])
+
+    # Opens the API connection before the first request
+    async def warm_up(self):
+        await self.model.count_tokens_async("warm up")
+
+
+# Seconds of latency drawn from a spec such as "fixed:0.5", "uniform:0.2,1.5",
+# "lognormal:0.8,0.5" (median, sigma) or "exponential:0.5" (mean)
+def latency_distribution(spec: str) -> Callable[[random.Random], float]:
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(value) for value in args.split(",") if value.strip()]
+        if kind == "fixed":
+            (delay,) = values
+            return lambda rng: delay
+        if kind == "uniform":
+            low, high = values
+            return lambda rng: rng.uniform(low, high)
+        if kind == "lognormal":
+            median, sigma = values
+            return lambda rng: median * rng.lognormvariate(0, sigma)
+        if kind == "exponential":
+            (mean,) = values
+            return lambda rng: rng.expovariate(1 / mean) if mean > 0 else 0.0
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency distribution: {spec}")
+
+
+# In-process stand-in for Gemini, so the app can be load tested offline
+# Every call waits for a latency drawn from the distribution. A throttle_rate share of calls
+# fails at once with a 429 and an error_rate share fails with a 500 after the latency, both as
+# google.api_core exceptions so the outbound scheduler retries and backs off as it would
+# against the API. Calls with a response schema get JSON cards for the words in the prompt,
+# from the canned cards when the word is there, other calls a canned tutor reply.
+class FakeBackend(LLMBackend):
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: str = "lognormal:0.8,0.4",
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        cards: Optional[Dict[str, Dict]] = None,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency_distribution(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.cards = {normalize_text(word): card for word, card in (cards or {}).items()}
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+
+    async def generate_content_async(self, contents: List[str], generation_config: Optional[Dict] = None):
+        prompt = "\n".join(str(content) for content in contents)
+        schema = (generation_config or {}).get("response_schema")
+        text = self._json_answer(prompt, schema) if schema else FAKE_CHAT_REPLY.format(word="it")
+        return await self._respond(prompt, text)
+
+    def start_chat(self, history: Optional[List[Dict]] = None):
+        return FakeChatSession(self, history or [])
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "calls": self.calls, "errors": self.errors, "throttled": self.throttled}
+
+    # Wait for the drawn latency and return the response, or raise the injected failure
+    async def _respond(self, prompt: str, text: str, stream: bool = False):
+        from google.api_core import exceptions as api_exceptions
+        self.calls += 1
+        if self._rng.random() < self.throttle_rate:
+            self.throttled += 1
+            raise api_exceptions.TooManyRequests("Fake LLM backend: quota exceeded")
+        await asyncio.sleep(self.latency(self._rng))
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            raise api_exceptions.InternalServerError("Fake LLM backend: internal error")
+
+        usage = SimpleNamespace(prompt_token_count=estimate_tokens(prompt), candidates_token_count=estimate_tokens(text))
+        if stream:
+            return FakeStreamResponse(text, usage)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def _json_answer(self, prompt: str, schema: Dict) -> str:
+        if schema["type"] == "ARRAY":
+            fields = schema["items"]["properties"]
+            return json.dumps([
+                {"index": int(index), **self._card_fields(word, context, fields)}
+                for index, word, context in _BATCH_ITEM.findall(prompt)
+            ], ensure_ascii=False)
+
+        word = _SINGLE_WORD.search(prompt)
+        context = _SINGLE_CONTEXT.search(prompt)
+        return json.dumps(
+            self._card_fields(word.group(1) if word else "", context.group(1) if context else "none", schema["properties"]),
+            ensure_ascii=False
+        )
+
+    def _card_fields(self, word: str, context: str, fields: Dict) -> Dict:
+        context = None if context.strip() == "none" else context.strip()
+        card = {
+            "word": word,
+            "t_word": f"{word} (translation)",
+            "synonyms": "",
+            "description": f"General meaning of '{word}'" + (" and its meaning in the sentence" if context else ""),
+            "sentence": context,
+            "t_sentence": f"{context} (translation)" if context else None,
+            "pronunciation": f"/{word}/",
+            "part_of_speech": "noun",
+            **self.cards.get(normalize_text(word), {}),
+        }
+        return {field: card.get(field) for field in fields if field != "index"}
+
+
+class FakeChatSession:
+    def __init__(self, backend: FakeBackend, history: List[Dict]):
+        self.backend = backend
+        self.history = [_content(message["role"], message["parts"]) for message in history]
+
+    async def send_message_async(self, message: str, stream: bool = False):
+        transcript = "\n".join(part.text for content in self.history for part in content.parts)
+        word = _SINGLE_WORD.search(message)
+        reply = FAKE_CHAT_REPLY.format(word=word.group(1) if word else "it")
+        response = await self.backend._respond(transcript + "\n" + message, reply, stream)
+        self.history.extend([_content("user", [message]), _content("model", [reply])])
+        return response
+
+
+# Streamed fake response, the reply in a few chunks a few milliseconds apart
+class FakeStreamResponse:
+    def __init__(self, text: str, usage_metadata, chunks: int = 4, interval: float = 0.005):
+        self.text = text
+        self.usage_metadata = usage_metadata
+        self._chunks = chunks
+        self._interval = interval
+
+    async def __aiter__(self):
+        size = -(-len(self.text) // self._chunks)
+        for start in range(0, len(self.text), size):
+            if start:
+                await asyncio.sleep(self._interval)
+            yield SimpleNamespace(parts=[SimpleNamespace(text=self.text[start:start + size])])
+
+
+def _content(role: str, parts: List[str]):
+    return SimpleNamespace(role=role, parts=[SimpleNamespace(text=text) for text in parts])
+
+
+# Backend selected by LLM_BACKEND
+def create_llm_backend(settings) -> LLMBackend:
+    if settings.LLM_BACKEND == "gemini":
+        return GeminiBackend(settings.GEMINI_API_KEY)
+    if settings.LLM_BACKEND == "fake":
+        cards = None
+        if settings.FAKE_LLM_CARDS:
+            with open(settings.FAKE_LLM_CARDS, encoding="utf-8") as f:
+                cards = json.load(f)
+        return FakeBackend(
+            latency=settings.FAKE_LLM_LATENCY,
+            error_rate=settings.FAKE_LLM_ERROR_RATE,
+            throttle_rate=settings.FAKE_LLM_THROTTLE_RATE,
+            cards=cards,
+            seed=int(settings.FAKE_LLM_SEED) if settings.FAKE_LLM_SEED else None
+        )
+    raise ValueError(f"Unknown LLM backend: {settings.LLM_BACKEND}")
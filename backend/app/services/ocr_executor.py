@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from importlib import import_module
+from typing import Dict, List, Optional
+from app.config.settings import get_settings
+from app.image_to_text.text_operations import get_sentences_for_words
+from app.monitoring.metrics import observe, record_timings
+
+logger = logging.getLogger(__name__)
+
+# Number of recent jobs kept for percentile metrics
+METRICS_WINDOW = 1000
+
+
+class OCRQueueFullError(Exception):
+    """Raised when the OCR executor has no room for another job"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("OCR queue is full, please retry later")
+        self.retry_after = retry_after
+
+
+# True when every word has at least one complete sentence in the recognized blocks
+def _words_covered(blocks: List[Optional[str]], words: List[str]) -> bool:
+    covered = set()
+    for block in blocks:
+        if block:
+            covered.update(get_sentences_for_words(block, words))
+    return len(covered) == len(set(words))
+
+
+def _percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Process pool that runs OCR jobs off the event loop
+# At most max_queue work items are on the pool at once (running plus waiting), anything beyond
+# that is rejected with OCRQueueFullError so the endpoint can answer 503. An admitted job holds
+# one item, a tiled job runs its tiles in that item and in any items that are still free, so
+# fanning out into tiles never grows the pool's queue past max_queue.
+class OCRExecutor:
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue: int,
+        retry_after: int = 5,
+        confidence_threshold: Optional[float] = None,
+        backend_name: str = "auto",
+        tiled_min_dimension: Optional[int] = None
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.confidence_threshold = confidence_threshold
+        self.backend_name = backend_name
+        self.tiled_min_dimension = tiled_min_dimension
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Module with the job functions, imported with the pool so OpenCV and the OCR engine
+        # are only loaded by servers that actually run OCR
+        self._worker = None
+        # Admitted jobs, and pool work items held by them (one per job plus extra tile slots)
+        self._in_flight = 0
+        self._pool_items = 0
+        # Why the last warm-up failed, cleared once an OCR job succeeds
+        self.warm_up_error: Optional[str] = None
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.tier_counts = {"fast": 0, "full": 0, "tiled": 0}
+        self.early_stops = 0
+        self._queue_waits = deque(maxlen=METRICS_WINDOW)
+        self._run_times = deque(maxlen=METRICS_WINDOW)
+
+    def start(self):
+        if self._pool is None:
+            from app.services import ocr_worker
+            self._worker = ocr_worker
+            # spawn keeps the workers free of the parent's threads and gRPC state
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"OCR executor started with {self.max_workers} workers")
+
+    async def warm_up(self):
+        # OpenCV and the OCR engine are imported off the event loop, requests keep being served
+        await asyncio.to_thread(import_module, "app.services.ocr_worker")
+        self.start()
+        loop = asyncio.get_running_loop()
+        try:
+            pids = await asyncio.gather(
+                *(loop.run_in_executor(self._pool, self._worker.warm_up_worker, self.backend_name) for _ in range(self.max_workers))
+            )
+        except Exception as e:
+            self.warm_up_error = str(e)
+            raise
+        self.warm_up_error = None
+        logger.info(f"OCR executor warmed up {len(set(pids))} workers")
+
+    async def submit(self, image_content: bytes, words: Optional[List[str]] = None) -> Dict:
+        if not self._reserve_item():
+            self.rejected += 1
+            raise OCRQueueFullError(self.retry_after)
+
+        self.start()
+        self._in_flight += 1
+        try:
+            if self.tiled_min_dimension:
+                result = await self._run_tiled(image_content, words)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self._pool, self._worker.run_ocr_job, image_content, words,
+                    self.confidence_threshold, self.backend_name, time.time()
+                )
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._pool_items -= 1
+
+        record_timings(result.pop("timings", ()))
+        observe("ocr_queue", result["queue_wait"])
+        self.completed += 1
+        self.warm_up_error = None
+        self.tier_counts[result["tier"]] = self.tier_counts.get(result["tier"], 0) + 1
+        self._queue_waits.append(result["queue_wait"])
+        self._run_times.append(result["run_time"])
+        return result
+
+    # Layout-aware OCR: detect text blocks, recognize them in parallel as independent tiles
+    # and stop as soon as every requested word has a complete sentence.
+    # An early-stopped result has complete=False and only holds the blocks recognized so far.
+    async def _run_tiled(self, image_content: bytes, words: Optional[List[str]]) -> Dict:
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+        layout = await loop.run_in_executor(
+            self._pool, self._worker.run_layout_job, image_content, words,
+            self.confidence_threshold, self.backend_name, self.tiled_min_dimension, submitted_at
+        )
+        record_timings(layout.pop("timings"))
+        if "tiles" not in layout:
+            return layout
+
+        # One tile runs in the job's own work item, more in parallel only while items are free
+        tiles = deque(enumerate(layout["tiles"]))
+        blocks: List[Optional[str]] = [None] * len(tiles)
+        pending: Dict[asyncio.Future, int] = {}
+        extra_items = 0
+        try:
+            while tiles or pending:
+                while tiles:
+                    if len(pending) >= 1 + extra_items:
+                        if not self._reserve_item():
+                            break
+                        extra_items += 1
+                    index, tile = tiles.popleft()
+                    future = loop.run_in_executor(
+                        self._pool, self._worker.run_tile_job, tile, self.confidence_threshold, self.backend_name
+                    )
+                    pending[future] = index
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    tile_result = future.result()
+                    record_timings(tile_result["timings"])
+                    blocks[index] = tile_result["text"]
+                if not tiles:
+                    # Hand back the items the remaining tiles do not need
+                    surplus = extra_items - max(0, len(pending) - 1)
+                    if surplus > 0:
+                        extra_items -= surplus
+                        self._pool_items -= surplus
+                if (pending or tiles) and words and _words_covered(blocks, words):
+                    self.early_stops += 1
+                    break
+        finally:
+            self._pool_items -= extra_items
+            for future in pending:
+                future.cancel()
+
+        recognized = [block for block in blocks if block is not None]
+        return {
+            "text": "\n\n".join(recognized),
+            "blocks": recognized,
+            "tier": "tiled",
+            "complete": not pending and not tiles,
+            "confidence": None,
+            "queue_wait": layout["queue_wait"],
+            "run_time": time.time() - submitted_at - layout["queue_wait"],
+        }
+
+    # Take one of the max_queue pool work items, False when all are held
+    def _reserve_item(self) -> bool:
+        if self._pool_items >= self.max_queue:
+            return False
+        self._pool_items += 1
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "pool_items": self._pool_items,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "fast_tier": self.tier_counts.get("fast", 0),
+            "full_tier": self.tier_counts.get("full", 0),
+            "tiled_tier": self.tier_counts.get("tiled", 0),
+            "early_stops": self.early_stops,
+            "queue_wait_p50": _percentile(self._queue_waits, 0.5),
+            "queue_wait_p95": _percentile(self._queue_waits, 0.95),
+            "run_time_p50": _percentile(self._run_times, 0.5),
+            "run_time_p95": _percentile(self._run_times, 0.95),
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+@lru_cache()
+def get_ocr_executor() -> OCRExecutor:
+    settings = get_settings()
+    return OCRExecutor(
+        max_workers=settings.OCR_WORKERS,
+        max_queue=settings.OCR_QUEUE_SIZE,
+        retry_after=settings.OCR_RETRY_AFTER,
+        confidence_threshold=settings.OCR_CONFIDENCE_THRESHOLD if settings.OCR_TIERED else None,
+        backend_name=settings.OCR_BACKEND,
+        tiled_min_dimension=settings.OCR_TILED_MIN_DIMENSION if settings.OCR_TILED else None,
+    )
@@ -0,0 +1,101 @@
+# Job functions run by the OCRExecutor process pool (see app.services.ocr_executor)
+import os
+import time
+from typing import Dict, List, Optional
+import cv2
+import numpy as np
+from app.image_to_text.image_to_text import decode_image, image_to_text, image_to_text_tiered
+from app.image_to_text.ocr_backend import get_ocr_backend
+from app.image_to_text.layout import crop_blocks, detect_text_blocks
+from app.monitoring.metrics import collect_timings
+
+
+# Runs inside a pool worker: decode the upload and run OCR on it
+# With a confidence threshold the tiered pipeline is used, otherwise the full pipeline always runs.
+# Stage timings are returned with the result and recorded by the executor in the server process.
+def run_ocr_job(
+    image_content: bytes,
+    words: Optional[List[str]],
+    confidence_threshold: Optional[float],
+    backend_name: str,
+    submitted_at: float
+) -> Dict:
+    started_at = time.time()
+    backend = get_ocr_backend(backend_name)
+
+    with collect_timings() as timings:
+        img = decode_image(image_content)
+        if img is None:
+            raise ValueError("Invalid image format")
+
+        if confidence_threshold is None:
+            result = {"text": image_to_text(img, backend=backend), "tier": "full", "confidence": None}
+        else:
+            result = image_to_text_tiered(
+                img, words=words, confidence_threshold=confidence_threshold, backend=backend
+            )
+
+    result["timings"] = timings
+    result["queue_wait"] = max(0.0, started_at - submitted_at)
+    result["run_time"] = time.time() - started_at
+    return result
+
+
+# Runs inside a pool worker: decode the upload and split a large page into text blocks
+# Pages below min_dimension, or with a single block, are recognized right away like run_ocr_job.
+def run_layout_job(
+    image_content: bytes,
+    words: Optional[List[str]],
+    confidence_threshold: Optional[float],
+    backend_name: str,
+    min_dimension: int,
+    submitted_at: float
+) -> Dict:
+    started_at = time.time()
+
+    with collect_timings() as timings:
+        img = decode_image(image_content)
+        if img is None:
+            raise ValueError("Invalid image format")
+
+        boxes = []
+        if max(img.shape[:2]) >= min_dimension:
+            boxes = detect_text_blocks(img)
+
+        if len(boxes) <= 1:
+            backend = get_ocr_backend(backend_name)
+            if confidence_threshold is None:
+                result = {"text": image_to_text(img, backend=backend), "tier": "full", "confidence": None}
+            else:
+                result = image_to_text_tiered(
+                    img, words=words, confidence_threshold=confidence_threshold, backend=backend
+                )
+        else:
+            result = {"tiles": crop_blocks(img, boxes)}
+
+    result["timings"] = timings
+    result["queue_wait"] = max(0.0, started_at - submitted_at)
+    result["run_time"] = time.time() - started_at
+    return result
+
+
+# Runs inside a pool worker: recognize one text block as a uniform block of text (psm 6)
+# Only the mean confidence decides escalation, a block is not expected to hold every requested word.
+def run_tile_job(tile: np.ndarray, confidence_threshold: Optional[float], backend_name: str) -> Dict:
+    backend = get_ocr_backend(backend_name)
+    with collect_timings() as timings:
+        if confidence_threshold is None:
+            result = {"text": image_to_text(tile, psm=6, backend=backend), "tier": "full"}
+        else:
+            result = image_to_text_tiered(tile, psm=6, confidence_threshold=confidence_threshold, backend=backend)
+    result["timings"] = timings
+    return result
+
+
+# Runs inside a pool worker: load OpenCV and the OCR engine with its language data once
+# A missing engine or language data is raised to the caller, so readiness reports it
+def warm_up_worker(backend_name: str) -> int:
+    blank = np.full((64, 256), 255, np.uint8)
+    cv2.putText(blank, "warm up", (8, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, 0, 2)
+    image_to_text(blank, backend=get_ocr_backend(backend_name))
+    return os.getpid()
@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from app.config.settings import get_settings
+from app.monitoring.metrics import observe
+
+T = TypeVar("T")
+
+# Priority lanes, lower values are served first
+LANE_INTERACTIVE = 0
+LANE_BULK = 1
+LANE_NAMES = {LANE_INTERACTIVE: "interactive", LANE_BULK: "bulk"}
+
+# Errors worth retrying: quota (429), overload and transient server or network failures
+# The google.api_core exceptions are matched by name, so importing the scheduler does not load
+# google.api_core and grpc before the first Gemini call.
+API_ERROR_MODULE = "google.api_core.exceptions"
+THROTTLE_ERRORS = frozenset({"TooManyRequests", "ResourceExhausted"})
+TRANSIENT_ERRORS = THROTTLE_ERRORS | {"ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout"}
+
+
+# Names of the google.api_core exception classes error is an instance of
+def _api_error_names(error: BaseException) -> frozenset:
+    return frozenset(cls.__name__ for cls in type(error).__mro__ if cls.__module__ == API_ERROR_MODULE)
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    return bool(_api_error_names(error) & THROTTLE_ERRORS)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    return isinstance(error, (ConnectionError, asyncio.TimeoutError)) or bool(_api_error_names(error) & TRANSIENT_ERRORS)
+
+
+# Raised when a call could not start or finish within its deadline
+class SchedulerDeadlineError(Exception):
+    def __init__(self, lane: int, waited: float):
+        super().__init__(f"Gemini request ({LANE_NAMES[lane]}) did not complete within its deadline after {waited:.1f}s")
+        self.lane = lane
+
+
+# Scheduler for every outbound Gemini call made by this process
+# - A token bucket (rate_per_minute, burst) keeps the request rate within the API quota.
+# - The number of calls in flight is limited by an AIMD window: it grows by about one per
+#   window of successful calls and is halved on a 429 or a call slower than latency_target,
+#   at most once per cooldown so a burst of 429s from the same overload counts once.
+# - Transient errors are retried with full-jitter exponential backoff until max_attempts or
+#   the deadline of the call, whichever comes first.
+# - Waiting calls are served by lane, so interactive chat goes ahead of bulk card generation.
+class OutboundScheduler:
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        latency_target: float = 15.0,
+        deadlines: Optional[Dict[int, float]] = None,
+    ):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.latency_target = latency_target
+        self.deadlines = deadlines or {LANE_INTERACTIVE: 30.0, LANE_BULK: 120.0}
+
+        self.concurrency_limit = float(min(max_concurrency, max(min_concurrency, burst)))
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._last_decrease = 0.0
+        self._in_flight = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._wakeup_loop = None
+
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttled = 0
+        self.deadline_exceeded = 0
+
+    # Run call() (a coroutine factory, invoked once per attempt) under the scheduler
+    # Each attempt is timed as the metrics stage name, the wait for a slot as "gemini_queue".
+    async def run(self, call: Callable[[], Awaitable[T]], lane: int = LANE_BULK, deadline: Optional[float] = None, name: str = "gemini") -> T:
+        started = time.monotonic()
+        deadline_at = started + (deadline if deadline is not None else self.deadlines[lane])
+
+        for attempt in range(self.max_attempts):
+            waited_from = time.monotonic()
+            await self._acquire(lane, deadline_at, started)
+            call_started = time.monotonic()
+            observe("gemini_queue", call_started - waited_from)
+            try:
+                result = await asyncio.wait_for(call(), max(0.0, deadline_at - call_started))
+            except BaseException as e:
+                if not is_transient_error(e):
+                    self._release(time.monotonic() - call_started)
+                    self.failed += 1
+                    raise
+                observe(name, time.monotonic() - call_started)
+                self._release(time.monotonic() - call_started, throttled=is_throttle_error(e))
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if attempt + 1 == self.max_attempts or time.monotonic() + delay >= deadline_at:
+                    self.failed += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            observe(name, time.monotonic() - call_started)
+            self._release(time.monotonic() - call_started)
+            self.completed += 1
+            return result
+
+    def stats(self) -> Dict:
+        self._refill()
+        depth = {name: 0 for name in LANE_NAMES.values()}
+        for lane, _, future in self._waiters:
+            if not future.done():
+                depth[LANE_NAMES[lane]] += 1
+        return {
+            "queue_depth": depth,
+            "in_flight": self._in_flight,
+            "concurrency_limit": int(self.concurrency_limit),
+            "tokens_available": round(self._tokens, 2),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "deadline_exceeded": self.deadline_exceeded,
+        }
+
+    async def _acquire(self, lane: int, deadline_at: float, started: float):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane, next(self._sequence), future))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, max(0.0, deadline_at - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            self.failed += 1
+            raise SchedulerDeadlineError(lane, time.monotonic() - started) from None
+        except asyncio.CancelledError:
+            # The slot may have been granted just before the cancellation
+            if future.done() and not future.cancelled():
+                self._release(None)
+            raise
+
+    # Return a slot and adjust the concurrency window
+    # latency is None when the slot was granted but never used.
+    def _release(self, latency: Optional[float], throttled: bool = False):
+        self._in_flight -= 1
+        if throttled:
+            self.throttled += 1
+        if latency is not None:
+            if throttled or latency > self.latency_target:
+                now = time.monotonic()
+                if now - self._last_decrease >= min(self.latency_target, 1.0):
+                    self._last_decrease = now
+                    self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+            else:
+                self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+        self._dispatch()
+
+    # Grant slots to waiting calls in lane order while concurrency and tokens allow
+    def _dispatch(self):
+        self._refill()
+        while self._waiters and self._in_flight < int(self.concurrency_limit):
+            _, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self._tokens < 1:
+                self._schedule_wakeup((1 - self._tokens) / self.rate)
+                return
+            heapq.heappop(self._waiters)
+            self._tokens -= 1
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _schedule_wakeup(self, delay: float):
+        loop = asyncio.get_running_loop()
+        if self._wakeup is not None and self._wakeup_loop is loop:
+            return
+
+        def wake():
+            self._wakeup = None
+            self._dispatch()
+
+        self._wakeup = loop.call_later(delay, wake)
+        self._wakeup_loop = loop
+
+
+# Scheduler shared by every Gemini call in this process
+# The configured quota is for the whole deployment, so it is split between uvicorn workers.
+@lru_cache()
+def get_outbound_scheduler() -> OutboundScheduler:
+    settings = get_settings()
+    workers = max(1, settings.WEB_CONCURRENCY)
+    return OutboundScheduler(
+        rate_per_minute=settings.GEMINI_RATE_LIMIT / workers,
+        burst=max(1, settings.GEMINI_BURST // workers),
+        max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+        max_attempts=settings.GEMINI_MAX_ATTEMPTS,
+        latency_target=settings.GEMINI_LATENCY_TARGET,
+        deadlines={
+            LANE_INTERACTIVE: settings.GEMINI_INTERACTIVE_DEADLINE,
+            LANE_BULK: settings.GEMINI_BULK_DEADLINE,
+        },
+    )
@@ -0,0 +1,208 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional
+from app.config.settings import get_settings
+
+
+# Storage for chat sessions
+# A session is a JSON-serializable dict (chat history and metadata). Sessions expire
+# `timeout` seconds after their last use, and when more than `capacity` sessions are
+# active the least recently used ones are evicted.
+class SessionStore:
+    def __init__(self, timeout: float, capacity: int):
+        self.timeout = timeout
+        self.capacity = capacity
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def put(self, session_id: str, session: Dict):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    # Remove expired sessions, returns how many were removed
+    def purge_expired(self) -> int:
+        raise NotImplementedError
+
+    def active_sessions(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active_sessions": self.active_sessions(),
+            "capacity": self.capacity,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def close(self):
+        pass
+
+
+# Sessions kept in this process only
+# Expiry uses a min-heap of (expires_at, session_id). Entries are not removed from the heap
+# when a session is touched. A stale entry is skipped when it reaches the top, so each
+# operation is O(log n) amortized and purging never scans every session.
+class InMemorySessionStore(SessionStore):
+    def __init__(self, timeout: float, capacity: int):
+        super().__init__(timeout, capacity)
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._expiry_heap = []
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._purge_expired()
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._touch(session_id, entry[0])
+            return entry[0]
+
+    def put(self, session_id: str, session: Dict):
+        with self._lock:
+            self._purge_expired()
+            self._touch(session_id, session)
+            while len(self._sessions) > self.capacity:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge_expired()
+
+    def active_sessions(self) -> int:
+        return len(self._sessions)
+
+    def _touch(self, session_id: str, session: Dict):
+        expires_at = time.time() + self.timeout
+        self._sessions[session_id] = (session, expires_at)
+        self._sessions.move_to_end(session_id)
+        heapq.heappush(self._expiry_heap, (expires_at, session_id))
+
+    def _purge_expired(self) -> int:
+        now = time.time()
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, session_id = heapq.heappop(self._expiry_heap)
+            entry = self._sessions.get(session_id)
+            # Skip heap entries left behind by a later touch or an eviction
+            if entry is not None and entry[1] == expires_at:
+                del self._sessions[session_id]
+                removed += 1
+        self.expired += removed
+        return removed
+
+
+# Sessions kept in a SQLite file so every uvicorn worker can resume any session
+# Expiry and LRU eviction use indexed columns, so neither scans the whole table. The number of
+# rows is kept in session_count by triggers, so the capacity check is a single row read that
+# stays right when several processes write to the file. The methods block on SQLite, async
+# callers run them with asyncio.to_thread.
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, db_path: str, timeout: float, capacity: int):
+        super().__init__(timeout, capacity)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+            # Counted once when the table is first seen without a counter, then kept by the triggers
+            self._db.execute("CREATE TABLE IF NOT EXISTS session_count (id INTEGER PRIMARY KEY CHECK (id = 0), count INTEGER NOT NULL)")
+            self._db.execute("INSERT OR IGNORE INTO session_count (id, count) SELECT 0, COUNT(*) FROM sessions")
+            self._db.execute(
+                "CREATE TRIGGER IF NOT EXISTS sessions_counted_insert AFTER INSERT ON sessions "
+                "BEGIN UPDATE session_count SET count = count + 1 WHERE id = 0; END"
+            )
+            self._db.execute(
+                "CREATE TRIGGER IF NOT EXISTS sessions_counted_delete AFTER DELETE ON sessions "
+                "BEGIN UPDATE session_count SET count = count - 1 WHERE id = 0; END"
+            )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE session_id = ? AND last_access > ?",
+                (session_id, now - self.timeout)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        return json.loads(row[0])
+
+    # An upsert rather than INSERT OR REPLACE, whose implicit delete would not fire the count trigger
+    def put(self, session_id: str, session: Dict):
+        data = json.dumps(session, ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (session_id, data, last_access) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, last_access = excluded.last_access",
+                (session_id, data, time.time())
+            )
+            overflow = self._db.execute("SELECT count FROM session_count WHERE id = 0").fetchone()[0] - self.capacity
+            if overflow > 0:
+                cursor = self._db.execute(
+                    "DELETE FROM sessions WHERE session_id IN "
+                    "(SELECT session_id FROM sessions ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                self.evicted += cursor.rowcount
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM sessions WHERE last_access <= ?", (time.time() - self.timeout,)
+            )
+        self.expired += cursor.rowcount
+        return cursor.rowcount
+
+    def active_sessions(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM sessions WHERE last_access > ?", (time.time() - self.timeout,)
+            ).fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+@lru_cache()
+def get_session_store() -> SessionStore:
+    settings = get_settings()
+    if settings.SESSION_STORE == "sqlite":
+        return SQLiteSessionStore(settings.SESSION_STORE_PATH, settings.SESSION_TIMEOUT, settings.SESSION_CAPACITY)
+    if settings.SESSION_STORE == "memory":
+        return InMemorySessionStore(settings.SESSION_TIMEOUT, settings.SESSION_CAPACITY)
+    raise ValueError(f"Unknown session store: {settings.SESSION_STORE}")
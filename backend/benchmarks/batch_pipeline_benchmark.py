@@ -0,0 +1,99 @@
+"""
+Compare page-by-page card creation with the pipelined stream_cards_from_pages.
+
+OCR and the Gemini API are replaced by sleeps of the given durations, so the numbers show the
+scheduling only: the sequential loop takes about pages * (OCR + generation), the pipeline should
+approach the slower of the two stages.
+
+Run from the backend directory:
+    python -m benchmarks.batch_pipeline_benchmark --pages 20 --ocr-ms 300 --card-ms 400
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.models.card import Card
+from app.services.create_card_service import CreateCardService
+
+
+class SimulatedGeminiService:
+    def __init__(self, card_seconds: float):
+        self.card_seconds = card_seconds
+
+    async def generate_card(self, word, n_language, l_language="English", sentence=None):
+        await asyncio.sleep(self.card_seconds)
+        return Card(word=word, t_word=word.upper(), sentence=sentence)
+
+
+# OCR pages with a fixed duration on a pool of ocr_workers, like the OCR process pool
+class SimulatedCardService(CreateCardService):
+    def __init__(self, ocr_seconds: float, ocr_workers: int, words_per_page: int, **kwargs):
+        super().__init__(**kwargs)
+        self.ocr_seconds = ocr_seconds
+        self.ocr_pool = asyncio.Semaphore(ocr_workers)
+        self.words_per_page = words_per_page
+
+    async def process_image_and_extract_sentences(self, image_content, words):
+        async with self.ocr_pool:
+            await asyncio.sleep(self.ocr_seconds)
+        page = int(image_content.decode())
+        page_words = words[page * self.words_per_page:(page + 1) * self.words_per_page]
+        sentences = {word: [f"Page {page} uses the word {word} in a sentence."] for word in page_words}
+        return {"text": "", "sentences": sentences, "ocr_tier": "simulated", "ocr_cache_hit": False}
+
+
+async def run_sequential(service, pages, words):
+    for content in pages:
+        extracted = await service.process_image_and_extract_sentences(content, words)
+        page_words = list(extracted["sentences"])
+        await service.create_cards_from_sentences(page_words, extracted["sentences"])
+
+
+async def run_pipelined(service, pages, words):
+    cards = 0
+    async for event in service.stream_cards_from_pages(iter(pages), words):
+        cards += event["event"] == "card"
+    return cards
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--words-per-page", type=int, default=3)
+    parser.add_argument("--ocr-ms", type=float, default=300)
+    parser.add_argument("--card-ms", type=float, default=400)
+    parser.add_argument("--ocr-workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = [str(page).encode() for page in range(args.pages)]
+    words = [f"word{index}" for index in range(args.pages * args.words_per_page)]
+
+    def make_service():
+        return SimulatedCardService(
+            ocr_seconds=args.ocr_ms / 1000,
+            ocr_workers=args.ocr_workers,
+            words_per_page=args.words_per_page,
+            gemini_service=SimulatedGeminiService(args.card_ms / 1000),
+            concurrency=args.concurrency,
+            batch_size=1,
+        )
+
+    ocr_total = args.pages * args.ocr_ms / 1000 / args.ocr_workers
+    card_total = args.pages * args.card_ms / 1000 * -(-args.words_per_page // args.concurrency)
+    print(f"{args.pages} pages, OCR stage {ocr_total:.2f} s, generation stage {card_total:.2f} s")
+
+    started = time.perf_counter()
+    asyncio.run(run_sequential(make_service(), pages, words))
+    print(f"sequential   {time.perf_counter() - started:6.2f} s")
+
+    started = time.perf_counter()
+    cards = asyncio.run(run_pipelined(make_service(), pages, words))
+    print(f"pipelined    {time.perf_counter() - started:6.2f} s   ({cards} cards)")
+
+
+if __name__ == "__main__":
+    main()
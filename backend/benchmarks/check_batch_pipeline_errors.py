@@ -0,0 +1,105 @@
+"""
+Regression check: the multi-page card pipeline finishes when the pages cannot be read.
+
+Feeds CreateCardService.stream_cards_from_pages page iterators that fail before the first page
+and after the first page, with OCR and card generation replaced by in-process stand-ins, and
+checks that each stream ends with an "error" event for the failing page and a "summary" within
+the timeout. Also checks that /api/cards/batch answers 415 to a PDF when pypdfium2 is missing.
+Exits with status 1 on any failure.
+
+Run from the backend directory:
+    python -m benchmarks.check_batch_pipeline_errors
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from typing import Dict, Iterator, List
+
+os.environ.setdefault("CARD_CACHE_PATH", "")
+os.environ.setdefault("LEXICON_ENABLED", "false")
+# The app started for the 415 check opens the job store, keep it out of data/
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="pipeline-check-"), "jobs.db"))
+
+from app.models.card import Card
+from app.services.create_card_service import CreateCardService
+
+
+class StubGeminiService:
+    async def generate_card(self, word: str, n_language: str, l_language: str = "English", sentence: str = None) -> Card:
+        return Card(word=word, t_word="test", sentence=sentence)
+
+
+def failing_pages(good_pages: int) -> Iterator[bytes]:
+    for index in range(good_pages):
+        yield f"page {index}".encode()
+    raise ValueError("corrupt page")
+
+
+async def collect(pages: Iterator[bytes], words: List[str], timeout: float) -> List[Dict]:
+    service = CreateCardService(gemini_service=StubGeminiService(), concurrency=2, batch_size=1)
+
+    async def extract(content: bytes, words: List[str]):
+        return {"sentences": {words[0]: [f"The {words[0]} is on {content.decode()}."]}, "ocr_tier": "stub", "ocr_cache_hit": False}
+
+    service.extract_sentences_when_ready = extract
+
+    async def run():
+        return [event async for event in service.stream_cards_from_pages(pages, words)]
+
+    return await asyncio.wait_for(run(), timeout)
+
+
+def check_stream(good_pages: int, timeout: float) -> List[str]:
+    try:
+        events = asyncio.run(collect(failing_pages(good_pages), ["river", "garden"], timeout))
+    except asyncio.TimeoutError:
+        return [f"{good_pages} readable pages: the stream did not finish within {timeout}s"]
+
+    failures = []
+    kinds = [event["event"] for event in events]
+    errors = [event for event in events if event["event"] == "error"]
+    if kinds[-1:] != ["summary"]:
+        failures.append(f"{good_pages} readable pages: the stream did not end with a summary: {kinds}")
+    if len(errors) != 1 or errors[0].get("page") != good_pages:
+        failures.append(f"{good_pages} readable pages: expected one error event for page {good_pages}: {errors}")
+    if kinds.count("page") != good_pages or kinds.count("card") != min(good_pages, 1):
+        failures.append(f"{good_pages} readable pages: unexpected page or card events: {kinds}")
+    return failures
+
+
+def check_pdf_rejected() -> List[str]:
+    from app.image_to_text.pages import pdf_supported
+    if pdf_supported():
+        print("pypdfium2 is installed, skipping the 415 check")
+        return []
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/cards/batch",
+            files={"files": ("document.pdf", b"%PDF-1.7\n", "application/pdf")},
+            data={"words": ["river"]},
+        )
+    if response.status_code != 415:
+        return [f"PDF upload without pypdfium2 answered {response.status_code}, expected 415"]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timeout", type=float, default=5)
+    args = parser.parse_args()
+
+    failures = check_stream(0, args.timeout) + check_stream(1, args.timeout) + check_pdf_rejected()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
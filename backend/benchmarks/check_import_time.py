@@ -0,0 +1,88 @@
+"""
+Regression check: importing app.main stays fast and does not load the OCR or LLM stacks.
+
+Imports app.main in a fresh interpreter under `python -X importtime`, without GEMINI_API_KEY,
+several times and takes the fastest run. Exits with status 1 when the cumulative import time of
+app.main is above the budget, or when any module that must be loaded lazily was imported,
+including grpc and any google.* package (the bare "google" namespace is set up by a .pth file
+at interpreter start and is not counted).
+
+Run from the backend directory:
+    python -m benchmarks.check_import_time --budget-ms 800
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Loaded on first use or by the background warm-up, never by importing the app
+LAZY_MODULES = ("cv2", "PIL", "pytesseract", "tesserocr", "google.generativeai", "matplotlib", "pypdfium2")
+
+# Packages of the LLM client stack, none of their modules may be in sys.modules after the import
+LAZY_PACKAGES = ("grpc", "google.")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def _run_import(module: str, *args: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env.pop("GEMINI_API_KEY", None)
+    completed = subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    return completed
+
+
+# Import a module in a fresh interpreter, returns module -> (self, cumulative) microseconds
+def measure(module: str) -> Dict[str, Tuple[int, int]]:
+    completed = _run_import(module, "-X", "importtime", "-c", f"import {module}")
+    times = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            times.setdefault(match.group(3), (int(match.group(1)), int(match.group(2))))
+    return times
+
+
+# Names in sys.modules after importing a module in a fresh interpreter
+def loaded_modules(module: str) -> List[str]:
+    completed = _run_import(module, "-c", f"import sys, {module}; print('\\n'.join(sys.modules))")
+    return completed.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=800)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    fastest = min(runs, key=lambda times: times[args.module][1])
+    total_ms = fastest[args.module][1] / 1000
+
+    print(f"{args.module}: {total_ms:.0f} ms cumulative (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+    print("Slowest modules by self time:")
+    for name, (self_us, cumulative_us) in sorted(fastest.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    eager = [name for name in LAZY_MODULES if name in fastest]
+    if eager:
+        failures.append(f"imported at startup, should be lazy: {', '.join(eager)}")
+    stack = sorted(name for name in loaded_modules(args.module) if name.startswith(LAZY_PACKAGES))
+    if stack:
+        failures.append(f"LLM client stack in sys.modules after import: {', '.join(stack[:10])}{' ...' if len(stack) > 10 else ''}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
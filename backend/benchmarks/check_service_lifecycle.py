@@ -0,0 +1,133 @@
+"""
+Regression check: thread, file descriptor and Gemini client counts stay flat under load.
+
+Sends mixed chat and card requests through the app with the Gemini API replaced by an
+in-process stand-in, then compares the counts before and after. Card requests go through the
+batched, schema-constrained path, answered with FakeBackend's JSON cards. Exits with status 1
+when any of the counts grew or a card response failed to parse.
+
+Run from the backend directory:
+    python -m benchmarks.check_service_lifecycle --requests 1000
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+
+os.environ.setdefault("GEMINI_API_KEY", "lifecycle-check")
+os.environ.setdefault("OCR_WORKERS", "1")
+os.environ.setdefault("CARD_CACHE_PATH", "")
+os.environ.setdefault("LEXICON_DIR", tempfile.mkdtemp(prefix="lifecycle-lexicon-"))
+
+import google.generativeai as genai
+from google.generativeai import protos
+from google.generativeai.types import generation_types
+from app.services.llm_backend import FakeBackend
+
+# Extra threads or descriptors tolerated after the run (e.g. lazily started executor threads)
+TOLERANCE = 2
+
+configure_calls = 0
+_real_configure = genai.configure
+
+
+def counting_configure(*args, **kwargs):
+    global configure_calls
+    configure_calls += 1
+    return _real_configure(*args, **kwargs)
+
+
+# Answers card calls (single and batch, full and lexicon context schemas) like the Gemini API would
+fake_backend = FakeBackend(latency="fixed:0")
+
+
+async def fake_generate_content_async(self, contents, generation_config=None, **kwargs):
+    if generation_config and generation_config.get("response_schema"):
+        return await fake_backend.generate_content_async(contents, generation_config)
+    # Chat turns need a real response, ChatSession appends its candidate to the history
+    prompt = contents[-1] if isinstance(contents, list) else contents
+    prompt = prompt if isinstance(prompt, str) else str(prompt)
+    word = re.search(r"word '([^']*)'", prompt)
+    text = json.dumps({"word": word.group(1), "t_word": "test"}) if word else "Looks good!"
+    response = protos.GenerateContentResponse(candidates=[protos.Candidate(
+        content=protos.Content(role="model", parts=[protos.Part(text=text)]),
+        finish_reason=protos.Candidate.FinishReason.STOP,
+    )])
+    return generation_types.AsyncGenerateContentResponse.from_response(response)
+
+
+async def fake_count_tokens_async(self, contents, **kwargs):
+    return protos.CountTokensResponse(total_tokens=1)
+
+
+def open_descriptors() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    genai.configure = counting_configure
+    genai.GenerativeModel.generate_content_async = fake_generate_content_async
+    genai.GenerativeModel.count_tokens_async = fake_count_tokens_async
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        def send(index: int):
+            kind = index % 3
+            if kind == 0:
+                response = client.post("/api/chat/check-sentence", json={
+                    "word": "river", "sentence": "I walked by the river.", "n_language": "Turkish"
+                })
+                session_id = response.json()["session_id"]
+                client.post("/api/chat/continue", json={"session_id": session_id, "message": "Why?"})
+            elif kind == 1:
+                client.post("/api/cards/text", json={
+                    "text": f"The river was quiet number {index}.", "words": ["river", "quiet"]
+                })
+            else:
+                client.post("/api/chat/continue", json={"session_id": "missing", "message": "Hello"})
+
+        # Let lazily created resources settle before taking the baseline
+        for index in range(30):
+            send(index)
+        baseline = (threading.active_count(), open_descriptors(), configure_calls)
+
+        for index in range(args.requests):
+            send(index)
+        final = (threading.active_count(), open_descriptors(), configure_calls)
+        card_stats = app.state.gemini_service.card_stats()
+
+    print(f"threads:           {baseline[0]} -> {final[0]}")
+    print(f"file descriptors:  {baseline[1]} -> {final[1]}")
+    print(f"genai.configure:   {baseline[2]} -> {final[2]}")
+    print(f"card calls:        {card_stats['calls']} for {card_stats['cards']} cards, {card_stats['parse_failures']} parse failures")
+
+    failures = []
+    if (
+        final[0] > baseline[0] + TOLERANCE
+        or final[1] > baseline[1] + TOLERANCE
+        or final[2] != baseline[2]
+    ):
+        failures.append("resources grew with the number of requests")
+    if card_stats["parse_failures"]:
+        failures.append(f"{card_stats['parse_failures']} card responses failed to parse")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Peak memory of decoding a large photo upload for OCR: the previous full-resolution chain
+against decode_image.
+
+Each method runs in a fresh process and reports how far the peak RSS rose above the RSS
+after the upload bytes were loaded.
+
+Run from the backend directory:
+    python -m benchmarks.decode_memory_benchmark --width 8000 --height 6000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from app.image_to_text.image_to_text import MAX_DIMENSION, decode_image
+from benchmarks.ocr_backend_benchmark import render_page
+
+
+# The decode chain used before: full-resolution color decode, a copy, a resize and a grayscale conversion
+def previous_decode(image_content: bytes) -> np.ndarray:
+    img = cv2.imdecode(np.frombuffer(image_content, np.uint8), cv2.IMREAD_COLOR)
+    img = img.copy()
+    height, width = img.shape[:2]
+    scale = MAX_DIMENSION / max(height, width)
+    img = cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+METHODS = {"previous": previous_decode, "decode_image": decode_image}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(method: str, path: str):
+    with open(path, "rb") as f:
+        image_content = f.read()
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    img = METHODS[method](image_content)
+    elapsed = time.perf_counter() - started
+    print(f"{method:>13}   {img.shape[1]}x{img.shape[0]}   peak +{peak_rss_mb() - baseline:7.1f} MB   {elapsed * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=8000)
+    parser.add_argument("--height", type=int, default=6000)
+    parser.add_argument("--child", choices=sorted(METHODS))
+    parser.add_argument("--image")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.image)
+        return
+
+    page = render_page(args.width, args.height, font_size=max(28, args.width // 60))
+    image_content = cv2.imencode(".jpg", page, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+    print(f"{args.width}x{args.height} JPEG, {len(image_content) / (1024 * 1024):.1f} MB upload")
+
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        f.write(image_content)
+    try:
+        for method in METHODS:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.decode_memory_benchmark", "--child", method, "--image", f.name],
+                check=True
+            )
+    finally:
+        os.remove(f.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Throughput and peak memory of streaming document ingestion against loading the whole text.
+
+The document is generated prose (see sentence_index_benchmark) sent as UTF-8 chunks to
+CreateCardService.extract_sentences_from_chunks, the path behind /api/cards/document. Peak
+memory is measured with tracemalloc and excludes the source text, so the streaming peak should
+stay flat as the document grows while the whole-text peak grows with it.
+
+Run from the backend directory:
+    python -m benchmarks.document_ingestion_benchmark --mb 1 10 --words 20
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+from typing import AsyncIterator, Callable, Tuple
+from app.image_to_text.text_operations import get_sentences_for_words
+from app.services.create_card_service import DOCUMENT_CHUNK_SIZE, CreateCardService
+from benchmarks.sentence_index_benchmark import VOCABULARY, generate_text
+
+MB = 1024 * 1024
+
+
+# Bytes of a document of `size` bytes, the 1MB block repeated, in chunks of chunk_size
+async def document_chunks(block: bytes, size: int, chunk_size: int) -> AsyncIterator[bytes]:
+    sent = 0
+    while sent < size:
+        offset = sent % len(block)
+        chunk = block[offset:offset + min(chunk_size, size - sent)]
+        sent += len(chunk)
+        yield chunk
+
+
+# Run a function under tracemalloc, returns (result, seconds, peak bytes)
+def measure(function: Callable) -> Tuple[object, float, int]:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        result = function()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--words", type=int, default=20)
+    parser.add_argument("--sentences-per-word", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=DOCUMENT_CHUNK_SIZE)
+    parser.add_argument("--skip-whole", action="store_true", help="only measure the streaming path")
+    args = parser.parse_args()
+
+    # A 1MB block cut at a sentence end, so repeating it keeps the text well formed
+    text = generate_text(MB)
+    block = text[:text.rfind(".", 0, MB) + 1].encode() + b" "
+    words = random.Random(11).sample(VOCABULARY, min(args.words, len(VOCABULARY)))
+    service = CreateCardService()
+
+    for size_mb in args.mb:
+        size = size_mb * MB
+
+        def stream():
+            chunks = document_chunks(block, size, args.chunk_size)
+            return asyncio.run(service.extract_sentences_from_chunks(chunks, words, args.sentences_per_word))
+
+        result, elapsed, peak = measure(stream)
+        print(
+            f"{size_mb:>4} MB  streaming  {size / MB / elapsed:7.1f} MB/s  peak {peak / MB:8.2f} MB"
+            f"  {result['sentence_count']} sentences, {len(result['sentences'])} words matched"
+        )
+
+        if args.skip_whole:
+            continue
+        whole_body = block * (size // len(block) + 1)
+
+        def whole():
+            found = get_sentences_for_words(whole_body[:size].decode(errors="replace"), words)
+            return {word: sentences[:args.sentences_per_word] for word, sentences in found.items()}
+
+        _, elapsed, peak = measure(whole)
+        print(f"{size_mb:>4} MB  whole text {size / MB / elapsed:7.1f} MB/s  peak {peak / MB:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
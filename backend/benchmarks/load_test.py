@@ -0,0 +1,237 @@
+"""
+End-to-end load test of the card and chat endpoints with open-loop mixed traffic.
+
+Requests arrive as a Poisson process at the target rate, whether or not earlier ones finished,
+and are spread over the endpoints by weight:
+- image:    POST /api/cards/image with a rendered page
+- text:     POST /api/cards/text with a generated passage
+- check:    POST /api/chat/check-sentence, which opens a chat session
+- continue: POST /api/chat/continue on a session opened by an earlier check
+
+Without --url the app runs in-process with LLM_BACKEND=fake, so no Gemini API key or network is
+needed. The fake backend's latency, error and 429 rates come from the FAKE_LLM_* settings, e.g.
+    FAKE_LLM_LATENCY=lognormal:0.8,0.5 FAKE_LLM_THROTTLE_RATE=0.05 python -m benchmarks.load_test --rps 20
+With --url the requests go to a running server (which may use either backend).
+
+Reports throughput, p50/p95/p99 latency of successful requests and the error rate per endpoint,
+and writes them as JSON with --output. Run from the backend directory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List
+import cv2
+import httpx
+from app.services.create_card_service import MAX_TEXT_LENGTH
+from benchmarks.ocr_text_benchmark import render_page, summarize
+from benchmarks.sentence_index_benchmark import VOCABULARY, generate_text
+
+ENDPOINTS = {
+    "image": "/api/cards/image",
+    "text": "/api/cards/text",
+    "check": "/api/chat/check-sentence",
+    "continue": "/api/chat/continue",
+}
+
+CHAT_MESSAGES = (
+    "Can you give me another example?",
+    "What is the difference between this word and its synonyms?",
+    "Is my sentence formal or informal?",
+    "How do I use it in the past tense?",
+)
+
+
+# Parse "text=4,check=3" into endpoint weights
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in mix: {name} (expected one of {', '.join(ENDPOINTS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# Request payloads, built up front so building them is not part of the measured latency
+class Payloads:
+    def __init__(self, seed: int, pages: int = 4):
+        self.rng = random.Random(seed)
+        self.passages = [generate_text(MAX_TEXT_LENGTH - 200, seed=seed + i)[:MAX_TEXT_LENGTH] for i in range(16)]
+        self.pages = []
+        for i in range(pages):
+            text = " ".join(generate_text(400, seed=seed + 100 + i).split())
+            self.pages.append(cv2.imencode(".png", render_page(text, 1000, None, 0, 0, seed + i))[1].tobytes())
+        self.sessions: List[str] = []
+
+    def words(self, count: int = 2) -> List[str]:
+        return self.rng.sample(VOCABULARY, count)
+
+    def request(self, endpoint: str) -> Dict:
+        if endpoint == "image":
+            return {
+                "files": {"image": ("page.png", self.rng.choice(self.pages), "image/png")},
+                "data": {"words": self.words(), "n_language": "Turkish"},
+            }
+        if endpoint == "text":
+            return {"json": {"text": self.rng.choice(self.passages), "words": self.words(), "n_language": "Turkish"}}
+        if endpoint == "check":
+            word = self.words(1)[0]
+            return {"json": {"word": word, "sentence": f"I {word} every morning.", "n_language": "Turkish"}}
+        return {"json": {"session_id": self.rng.choice(self.sessions), "message": self.rng.choice(CHAT_MESSAGES)}}
+
+
+# Latencies of successful requests and counts of failed ones, per endpoint
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.sent = defaultdict(int)
+
+    def report(self, elapsed: float) -> Dict[str, Dict]:
+        report = {}
+        for endpoint in sorted(self.sent):
+            latencies = self.latencies[endpoint]
+            failed = sum(self.errors[endpoint].values())
+            report[endpoint] = {
+                "sent": self.sent[endpoint],
+                "ok": len(latencies),
+                "throughput_rps": len(latencies) / elapsed,
+                "error_rate": failed / self.sent[endpoint],
+                "errors": dict(self.errors[endpoint]),
+                **(summarize(latencies) if latencies else {}),
+            }
+        return report
+
+
+async def send(client: httpx.AsyncClient, endpoint: str, payloads: Payloads, results: Results):
+    # A continue before any session exists opens one instead
+    if endpoint == "continue" and not payloads.sessions:
+        endpoint = "check"
+    results.sent[endpoint] += 1
+    started = time.perf_counter()
+    try:
+        response = await client.post(ENDPOINTS[endpoint], **payloads.request(endpoint))
+    except httpx.HTTPError as e:
+        results.errors[endpoint][type(e).__name__] += 1
+        return
+    latency = time.perf_counter() - started
+    if response.status_code >= 400:
+        results.errors[endpoint][str(response.status_code)] += 1
+        return
+    results.latencies[endpoint].append(latency)
+    if endpoint == "check":
+        payloads.sessions.append(response.json()["session_id"])
+
+
+# Send requests at rps for duration seconds, then wait up to drain seconds for the ones in flight
+async def run_load(
+    client: httpx.AsyncClient,
+    rps: float,
+    duration: float,
+    mix: Dict[str, float],
+    payloads: Payloads,
+    drain: float,
+    seed: int
+) -> Dict:
+    rng = random.Random(seed)
+    results = Results()
+    tasks = set()
+    names, weights = list(mix), list(mix.values())
+
+    started = time.perf_counter()
+    next_at = started
+    while next_at - started < duration:
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        task = asyncio.create_task(send(client, rng.choices(names, weights)[0], payloads, results))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_at += rng.expovariate(rps)
+
+    unfinished = 0
+    if tasks:
+        _, pending = await asyncio.wait(set(tasks), timeout=drain)
+        unfinished = len(pending)
+        for task in pending:
+            task.cancel()
+    elapsed = time.perf_counter() - started
+    return {"elapsed_s": elapsed, "unfinished": unfinished, "endpoints": results.report(elapsed)}
+
+
+def print_report(report: Dict, target_rps: float):
+    print(f"\n{report['elapsed_s']:.1f}s at target {target_rps:g} rps, {report['unfinished']} requests unfinished")
+    print(f"{'endpoint':<10} {'sent':>6} {'ok':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}  by status")
+    for endpoint, stats in report["endpoints"].items():
+        print(
+            f"{endpoint:<10} {stats['sent']:>6} {stats['ok']:>6} {stats['throughput_rps']:>7.2f} "
+            f"{stats.get('p50_ms', 0):>8.0f} {stats.get('p95_ms', 0):>8.0f} {stats.get('p99_ms', 0):>8.0f} "
+            f"{stats['error_rate']:>7.1%}  {stats['errors'] or ''}"
+        )
+    if "llm_backend" in report:
+        print(f"LLM backend: {report['llm_backend']}")
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await client.get("/health/ready")
+        if response.status_code == 200 or "failed" in response.text:
+            return response.json()
+        await asyncio.sleep(0.2)
+    return {"status": "timeout"}
+
+
+async def main_async(args) -> Dict:
+    mix = parse_mix(args.mix)
+    payloads = Payloads(args.seed)
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.connections)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            print(f"Ready: {await wait_until_ready(client)}")
+            return await run_load(client, args.rps, args.duration, mix, payloads, args.drain, args.seed)
+
+    from app.main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+            print(f"Ready: {await wait_until_ready(client)}")
+            report = await run_load(client, args.rps, args.duration, mix, payloads, args.drain, args.seed)
+        report["llm_backend"] = app.state.gemini_service.backend_stats()
+        report["scheduler"] = app.state.gemini_service.scheduler.stats()
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server, in-process app with the fake backend by default")
+    parser.add_argument("--rps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of sending")
+    parser.add_argument("--mix", default="image=1,text=3,check=2,continue=2")
+    parser.add_argument("--drain", type=float, default=30, help="seconds to wait for requests still in flight")
+    parser.add_argument("--timeout", type=float, default=60, help="per request timeout in seconds")
+    parser.add_argument("--connections", type=int, default=200, help="connection limit with --url")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if not args.url:
+        # Settings are read when the app is first set up
+        os.environ.setdefault("LLM_BACKEND", "fake")
+        os.environ.setdefault("CARD_CACHE_PATH", "")
+        os.environ.setdefault("LEXICON_ENABLED", "false")
+
+    report = asyncio.run(main_async(args))
+    report.update({"target_rps": args.rps, "mix": parse_mix(args.mix), "url": args.url})
+    print_report(report, args.rps)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
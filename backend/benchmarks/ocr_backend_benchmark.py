@@ -0,0 +1,98 @@
+"""
+Compare OCR backends on a rendered text page.
+
+Measures the first call and steady state latency of every backend that can run here, and checks
+that they agree: the recognized text and the words of image_to_data should match between backends.
+
+Run from the backend directory:
+    python -m benchmarks.ocr_backend_benchmark --runs 20
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from app.image_to_text.ocr_backend import PytesseractBackend, TesserocrBackend
+
+SAMPLE_TEXT = (
+    "Reading with cards turns every page into practice. "
+    "Students pick the words they do not know and the app builds a card for each one. "
+    "Every card keeps the sentence the word was found in, so the context is never lost."
+)
+
+
+# Render SAMPLE_TEXT as black text on a white grayscale page
+def render_page(width: int, height: int, font_size: int = 28) -> np.ndarray:
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=font_size)
+    words, line, y = SAMPLE_TEXT.split(), "", 40
+    for word in words:
+        candidate = f"{line} {word}".strip()
+        if draw.textlength(candidate, font=font) > width - 80:
+            draw.text((40, y), line, fill=0, font=font)
+            line, y = word, y + int(font_size * 1.6)
+        else:
+            line = candidate
+    draw.text((40, y), line, fill=0, font=font)
+    return np.array(page)
+
+
+def time_call(function, runs: int):
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def report(name: str, durations):
+    ordered = sorted(durations)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    print(
+        f"{name:<32} mean {statistics.mean(durations) * 1000:8.1f} ms"
+        f"   p50 {statistics.median(durations) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=600)
+    args = parser.parse_args()
+
+    img = render_page(args.width, args.height)
+    backends = [PytesseractBackend()]
+    try:
+        backends.append(TesserocrBackend())
+    except ImportError:
+        print("tesserocr is not installed, only the pytesseract backend is measured")
+
+    outputs = {}
+    for backend in backends:
+        # First call loads the language data, measured separately from steady state
+        started = time.perf_counter()
+        try:
+            backend.warm_up()
+        except Exception as e:
+            print(f"{backend.name}: unavailable ({e}), not measured")
+            continue
+        print(f"{backend.name}: first call {(time.perf_counter() - started) * 1000:.1f} ms")
+        report(f"{backend.name} image_to_string", time_call(lambda: backend.image_to_string(img), args.runs))
+        report(f"{backend.name} image_to_data", time_call(lambda: backend.image_to_data(img), args.runs))
+        data = backend.image_to_data(img)
+        outputs[backend.name] = (" ".join(backend.image_to_string(img).split()), [word for word in data["text"] if word.strip()])
+
+    if len(outputs) < 2:
+        print("Only one backend ran, outputs not compared")
+        return
+    (first, (text, words)), *others = outputs.items()
+    for name, (other_text, other_words) in others:
+        print(f"{first} vs {name}: text {'identical' if text == other_text else 'differs'}, "
+              f"words {'identical' if words == other_words else f'{len(words)} vs {len(other_words)}'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Micro-benchmarks of the CPU-heavy text paths on a synthetic page corpus.
+
+- ocr: image_to_text on rendered pages with known text, across fonts, noise levels, rotations
+  and resolutions. Reports per-stage latency (decode, denoise, threshold, tesseract) and the
+  character accuracy of the recognized text against the ground truth.
+- regex: get_sentence_with_word_regex scaling with text length and number of looked up words,
+  next to get_sentences_for_words.
+- card: Card validation throughput, single cards from dicts and batches from JSON.
+
+Every measurement is reported as mean/p50/p95/p99 and all results are written as JSON, so the
+files of two commits can be compared:
+    python -m benchmarks.ocr_text_benchmark --output before.json
+    git checkout <other commit>
+    python -m benchmarks.ocr_text_benchmark --output after.json --compare before.json
+
+Run from the backend directory. The corpus is seeded, the same arguments render the same pages.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from pydantic import TypeAdapter
+from app.image_to_text.image_to_text import decode_image, image_to_text
+from app.image_to_text.text_operations import get_sentence_with_word_regex, get_sentences_for_words
+from app.models.card import Card
+from app.monitoring.metrics import collect_timings
+from benchmarks.sentence_index_benchmark import VOCABULARY, generate_text, regex_lookup
+
+# Candidate TrueType fonts, the ones that are installed are used next to Pillow's built-in font
+FONT_FILES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSerif-Regular.ttf",
+)
+
+# Font size relative to the page width, about 60 characters per line
+FONT_SIZE_RATIO = 1 / 40
+
+# Result fields shown in the summary and compared between runs
+COMPARED_KEYS = ("p50_ms", "p95_ms", "cards_per_second", "accuracy")
+
+CARD_SAMPLE = {
+    "word": "borrow",
+    "t_word": "ödünç almak",
+    "description": "To take something from someone with the intention of giving it back.",
+    "pronunciation": "/ˈbɒr.əʊ/",
+    "part_of_speech": "verb",
+    "synonyms": "take on loan, lease",
+    "sentence": "Can I borrow your pen for a moment?",
+    "t_sentence": "Kalemini bir dakikalığına ödünç alabilir miyim?",
+}
+
+
+def available_fonts() -> Dict[str, Optional[str]]:
+    fonts = {"pillow-default": None}
+    for path in FONT_FILES:
+        if os.path.exists(path):
+            fonts[os.path.splitext(os.path.basename(path))[0]] = path
+    return fonts
+
+
+def load_font(path: Optional[str], size: int):
+    return ImageFont.load_default(size=size) if path is None else ImageFont.truetype(path, size)
+
+
+# Render text as black on white, word wrapped, then rotate and add Gaussian noise
+def render_page(text: str, width: int, font_path: Optional[str], noise: float, rotation: float, seed: int) -> np.ndarray:
+    font_size = max(12, int(width * FONT_SIZE_RATIO))
+    font = load_font(font_path, font_size)
+    margin = font_size * 2
+    line_height = int(font_size * 1.6)
+
+    measure = ImageDraw.Draw(Image.new("L", (1, 1)))
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if line and measure.textlength(candidate, font=font) > width - 2 * margin:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    lines.append(line)
+
+    page = Image.new("L", (width, 2 * margin + line_height * len(lines)), 255)
+    draw = ImageDraw.Draw(page)
+    for index, line in enumerate(lines):
+        draw.text((margin, margin + index * line_height), line, fill=0, font=font)
+    if rotation:
+        page = page.rotate(rotation, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+    img = np.asarray(page, dtype=np.float32)
+    if noise:
+        img = img + np.random.default_rng(seed).normal(0, noise, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+# One page per combination of font, noise, rotation and width, each with its own text
+def build_corpus(widths: List[int], noises: List[float], rotations: List[float], fonts: Dict[str, Optional[str]], seed: int):
+    rng = random.Random(seed)
+    pages = []
+    for font_name, font_path in fonts.items():
+        for width in widths:
+            for noise in noises:
+                for rotation in rotations:
+                    page_seed = rng.randrange(2 ** 32)
+                    text = " ".join(generate_text(400, seed=page_seed).split())
+                    img = render_page(text, width, font_path, noise, rotation, page_seed)
+                    pages.append({
+                        "font": font_name,
+                        "width": width,
+                        "noise": noise,
+                        "rotation": rotation,
+                        "text": text,
+                        "png": cv2.imencode(".png", img)[1].tobytes(),
+                    })
+    return pages
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    ordered = sorted(durations)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+# 1 - edit distance / length of the ground truth, whitespace normalized, floored at 0
+def character_accuracy(recognized: str, truth: str) -> float:
+    recognized, truth = " ".join(recognized.split()), " ".join(truth.split())
+    if not truth:
+        return 1.0 if not recognized else 0.0
+    return max(0.0, 1 - edit_distance(recognized, truth) / len(truth))
+
+
+def run_ocr(pages, runs: int) -> Dict:
+    stage_durations: Dict[str, List[float]] = {}
+    totals, accuracies, groups, errors = [], [], {}, {}
+
+    for page in pages:
+        for _ in range(runs):
+            started = time.perf_counter()
+            recognized = None
+            with collect_timings() as timings:
+                try:
+                    recognized = image_to_text(decode_image(page["png"]))
+                except Exception as e:
+                    errors[str(e)] = errors.get(str(e), 0) + 1
+            totals.append(time.perf_counter() - started)
+            for name, seconds in timings:
+                stage_durations.setdefault(name, []).append(seconds)
+
+        if recognized is not None:
+            accuracy = character_accuracy(recognized, page["text"])
+            accuracies.append(accuracy)
+            for dimension in ("font", "width", "noise", "rotation"):
+                groups.setdefault(f"{dimension}={page[dimension]}", []).append(accuracy)
+
+    result = {
+        "pages": len(pages),
+        "total": summarize(totals),
+        "stages": {name: summarize(durations) for name, durations in stage_durations.items()},
+        "accuracy": statistics.mean(accuracies) if accuracies else None,
+        "accuracy_by": {key: statistics.mean(values) for key, values in sorted(groups.items())},
+    }
+    if errors:
+        result["errors"] = errors
+    return result
+
+
+def run_regex(chars_list: List[int], word_counts: List[int], runs: int) -> Dict:
+    rng = random.Random(11)
+    results = {}
+    for chars in chars_list:
+        text = generate_text(chars)
+        for word_count in word_counts:
+            words = rng.sample(VOCABULARY, min(word_count, len(VOCABULARY)))
+            regex_times, index_times = [], []
+            for _ in range(runs):
+                started = time.perf_counter()
+                regex_lookup(text, words)
+                regex_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                get_sentences_for_words(text, words)
+                index_times.append(time.perf_counter() - started)
+            results[f"{chars}chars_{word_count}words"] = {
+                "get_sentence_with_word_regex": summarize(regex_times),
+                "get_sentences_for_words": summarize(index_times),
+            }
+    # Single word per call, the unit of work behind each card
+    text = generate_text(chars_list[0])
+    single = []
+    for _ in range(runs * 20):
+        started = time.perf_counter()
+        get_sentence_with_word_regex(text, rng.choice(VOCABULARY))
+        single.append(time.perf_counter() - started)
+    results[f"{chars_list[0]}chars_single_call"] = {"get_sentence_with_word_regex": summarize(single)}
+    return results
+
+
+# Each sample is a batch of validations, reported per batch plus the overall rate
+def run_card(batches: int, batch_size: int) -> Dict:
+    cards_adapter = TypeAdapter(List[Card])
+    payloads = [dict(CARD_SAMPLE, card_id=index) for index in range(batch_size)]
+    payload_json = json.dumps(payloads, ensure_ascii=False).encode()
+
+    single, batch = [], []
+    for _ in range(batches):
+        started = time.perf_counter()
+        for payload in payloads:
+            Card.model_validate(payload)
+        single.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        cards_adapter.validate_json(payload_json)
+        batch.append(time.perf_counter() - started)
+
+    return {
+        "batch_size": batch_size,
+        "model_validate": dict(summarize(single), cards_per_second=batch_size * len(single) / sum(single)),
+        "validate_json": dict(summarize(batch), cards_per_second=batch_size * len(batch) / sum(batch)),
+    }
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "opencv": cv2.__version__,
+        "cpus": os.cpu_count(),
+    }
+
+
+# Flatten the nested results to "path -> value" for the numbers worth comparing
+def comparable(results: Dict, prefix: str = "") -> Dict[str, float]:
+    values = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(comparable(value, path + "."))
+        elif isinstance(value, (int, float)) and (key in COMPARED_KEYS or prefix.endswith("accuracy_by.")):
+            values[path] = value
+    return values
+
+
+def print_results(results: Dict, baseline: Optional[Dict]):
+    current = comparable({name: results[name] for name in ("ocr", "regex", "card") if name in results})
+    previous = comparable({name: baseline[name] for name in ("ocr", "regex", "card") if name in baseline}) if baseline else {}
+    for path, value in current.items():
+        line = f"{path:<90} {value:12.3f}"
+        if path in previous and previous[path]:
+            line += f"   {(value - previous[path]) / previous[path] * 100:+7.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", nargs="+", choices=["ocr", "regex", "card"], default=["ocr", "regex", "card"])
+    parser.add_argument("--widths", type=int, nargs="+", default=[800, 1600, 3200])
+    parser.add_argument("--noise", type=float, nargs="+", default=[0, 25])
+    parser.add_argument("--rotations", type=float, nargs="+", default=[0, 2])
+    parser.add_argument("--ocr-runs", type=int, default=1)
+    parser.add_argument("--chars", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--words", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--regex-runs", type=int, default=5)
+    parser.add_argument("--card-batches", type=int, default=50)
+    parser.add_argument("--card-batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to show changes against")
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "arguments": vars(args)}
+    if "ocr" in args.suites:
+        pages = build_corpus(args.widths, args.noise, args.rotations, available_fonts(), args.seed)
+        print(f"OCR corpus: {len(pages)} pages", file=sys.stderr)
+        results["ocr"] = run_ocr(pages, args.ocr_runs)
+    if "regex" in args.suites:
+        results["regex"] = run_regex(args.chars, args.words, args.regex_runs)
+    if "card" in args.suites:
+        results["card"] = run_card(args.card_batches, args.card_batch_size)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} (commit {baseline['environment'].get('commit')})")
+    print_results(results, baseline)
+    for message, count in results.get("ocr", {}).get("errors", {}).items():
+        print(f"OCR failed {count}x: {message}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Compare per-word regex scans with the SentenceIndex on book-length text.
+
+Before timing, checks that both return the same sentences, also on text where words are
+written with letters that re.IGNORECASE and str.lower() fold differently ("İstanbul", "ſun").
+
+Run from the backend directory:
+    python -m benchmarks.sentence_index_benchmark --chars 500000 --words 10 50 --runs 1
+"""
+import argparse
+import random
+import time
+from app.image_to_text.text_operations import SentenceIndex, get_sentence_with_word_regex, get_sentences_for_words
+
+VOCABULARY = (
+    "the a of and to in is was it for on with as his that her he she they at by from this had not "
+    "river garden window morning student teacher language reading winter summer letter journey "
+    "quickly slowly bright quiet ancient careful remember discover whisper travel believe borrow"
+).split()
+
+
+# Build text that looks like prose: sentences of 6-24 words, mixed terminators, line breaks
+def generate_text(chars: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < chars:
+        words = [rng.choice(VOCABULARY) for _ in range(rng.randint(6, 24))]
+        words[0] = words[0].capitalize()
+        sentence = " ".join(words) + rng.choice([".", ".", ".", "!", "?"])
+        sentence += "\n" if rng.random() < 0.1 else " "
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)
+
+
+# Letters that re.IGNORECASE matches with an ASCII letter although str.lower() maps them elsewhere
+CASE_VARIANTS = {"i": ("İ", "ı"), "s": ("ſ",), "k": ("\u212a",)}
+
+
+# Prose where some words use CASE_VARIANTS letters or are upper case, and the words to look up:
+# the vocabulary, its upper case forms and the variant spellings that occur in the text
+def generate_case_text(chars: int, seed: int = 13):
+    rng = random.Random(seed)
+    words = rng.sample(VOCABULARY, 12)
+    variants = set()
+    for word in words:
+        spelled = "".join(rng.choice(CASE_VARIANTS.get(ch, (ch,))) if rng.random() < 0.5 else ch for ch in word)
+        variants.update((spelled, spelled.upper(), word.upper()))
+    pool = words + sorted(variants)
+    parts, length = [], 0
+    while length < chars:
+        sentence = " ".join(rng.choice(pool) for _ in range(rng.randint(4, 12))) + rng.choice([".", "!", "?"]) + " "
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts), words + sorted(variants)
+
+
+# SentenceIndex.find must return what the regex returns for every word, as given and lower cased
+def check_case_folding(chars: int = 20_000):
+    text, words = generate_case_text(chars)
+    index = SentenceIndex(text)
+    for word in words:
+        for query in (word, word.lower()):
+            if index.find(query) != get_sentence_with_word_regex(text, query):
+                raise SystemExit(f"Results differ for {query!r} on text with case variants")
+    print(f"case folding: {len(words)} words agree with the regex")
+
+
+# The lookup loop used before the sentence index
+def regex_lookup(text, words):
+    results = {}
+    for word in words:
+        sentences = get_sentence_with_word_regex(text, word.lower())
+        if sentences:
+            results[word] = sentences
+    return results
+
+
+def best_of(function, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chars", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--words", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    check_case_folding()
+    rng = random.Random(11)
+    for chars in args.chars:
+        text = generate_text(chars)
+        for word_count in args.words:
+            words = rng.sample(VOCABULARY, min(word_count, len(VOCABULARY)))
+            expected = regex_lookup(text, words)
+            actual = get_sentences_for_words(text, words)
+            if expected != actual:
+                raise SystemExit(f"Results differ for {chars} chars and {word_count} words")
+
+            regex_time = best_of(lambda: regex_lookup(text, words), args.runs)
+            index_time = best_of(lambda: get_sentences_for_words(text, words), args.runs)
+            print(
+                f"{chars:>9} chars {word_count:>3} words   regex {regex_time * 1000:9.1f} ms"
+                f"   index {index_time * 1000:9.1f} ms   speedup {regex_time / index_time:6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()